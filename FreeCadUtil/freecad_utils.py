@@ -2,9 +2,12 @@
 # -*- coding: utf-8 -*-
 import FreeCAD as App
 import Part
+import functools
+import logging
 import math
 import sys
 import os
+import numpy as np
 
 # Add sheetmetal directory to path
 sheetmetal_path = os.path.join(os.path.dirname(__file__), 'sheetmetal')
@@ -18,6 +21,203 @@ def taskRestoreDefaults(obj, default_vars):
     pass
 SheetMetalTools.taskRestoreDefaults = taskRestoreDefaults
 
+logger = logging.getLogger(__name__)
+
+def _cut_offset(length, angle_deg):
+    """
+    Return the axial offset of an angled end cut, or None if the cut is degenerate.
+
+    Angles within 1e-3° of 0° or 90° are rejected, since tan() is zero or
+    infinite there.
+    """
+    if abs(angle_deg) < 0.001 or abs(angle_deg - 90.0) < 0.001:
+        return None
+    return length / math.tan(math.radians(angle_deg))
+
+# Face index cache for hole drilling, keyed by TopoShape.hashCode()
+_FACE_INDEX_CACHE = {}
+_FACE_INDEX_CACHE_SIZE = 8
+
+def _get_face_index(shape):
+    """
+    Return (faces, center_normals, areas, parameter_ranges) for a shape.
+
+    center_normals is an (N, 3) array and areas an (N,) array, in face order.
+
+    Results are cached by shape.hashCode(). Boolean operations return a new
+    shape with a new hash code, so a cut bracket is re-indexed automatically.
+    The cached entry keeps a reference to its shape so the hash code cannot be
+    reused by another shape while the entry is alive.
+    """
+    key = shape.hashCode()
+    entry = _FACE_INDEX_CACHE.get(key)
+    if entry is not None and entry[0].isSame(shape):
+        return entry[1]
+
+    faces = shape.Faces
+    parameter_ranges = [face.ParameterRange for face in faces]
+    normals = np.array([tuple(face.normalAt((u0 + u1) / 2, (v0 + v1) / 2))
+                        for face, (u0, u1, v0, v1) in zip(faces, parameter_ranges)],
+                       dtype=float).reshape(-1, 3)
+    areas = np.fromiter((face.Area for face in faces), dtype=float, count=len(faces))
+    index = (faces, normals, areas, parameter_ranges)
+
+    if len(_FACE_INDEX_CACHE) >= _FACE_INDEX_CACHE_SIZE:
+        _FACE_INDEX_CACHE.pop(next(iter(_FACE_INDEX_CACHE)))
+    _FACE_INDEX_CACHE[key] = (shape, index)
+    return index
+
+def _best_face_by_normal(normals, areas, expected_normal, min_area, tolerance=0.3):
+    """
+    Pick the face whose center normal best matches expected_normal in either direction.
+
+    Returns (index, score), or (None, inf) if no face larger than min_area scores
+    below tolerance. Ties resolve to the first face, as in a sequential scan.
+    """
+    expected = np.asarray(expected_normal, dtype=float)
+    scores = np.minimum(np.abs(normals - expected).sum(axis=1),
+                        np.abs(normals + expected).sum(axis=1))
+    scores = np.where((scores < tolerance) & (areas > min_area), scores, np.inf)
+    if scores.size == 0:
+        return None, float('inf')
+    best = int(np.argmin(scores))
+    if not np.isfinite(scores[best]):
+        return None, float('inf')
+    return best, float(scores[best])
+
+def _select_edges_by_length(edges, length, length_tolerance, z_tolerance=None):
+    """
+    Return the edges whose Length is within length_tolerance of length.
+
+    If z_tolerance is given, only straight-through edges whose end-to-end
+    direction is parallel to Z (within z_tolerance per component) are kept.
+    The predicates are evaluated as NumPy array operations over all edges.
+    """
+    if not edges:
+        return []
+
+    lengths = np.fromiter((edge.Length for edge in edges), dtype=float, count=len(edges))
+    candidates = np.nonzero(np.abs(lengths - length) <= length_tolerance)[0]
+    if z_tolerance is None:
+        return [edges[i] for i in candidates]
+
+    # Only edges with two end vertices have a direction
+    candidates = [i for i in candidates if len(edges[i].Vertexes) >= 2]
+    if not candidates:
+        return []
+
+    points = np.array([(tuple(edges[i].Vertexes[0].Point), tuple(edges[i].Vertexes[1].Point))
+                       for i in candidates], dtype=float)
+    directions = points[:, 1] - points[:, 0]
+    norms = np.linalg.norm(directions, axis=1)
+    valid = norms > 1e-6
+    unit = directions / np.where(valid, norms, 1.0)[:, None]
+    mask = (valid
+            & (np.abs(unit[:, 0]) <= z_tolerance)
+            & (np.abs(unit[:, 1]) <= z_tolerance)
+            & (np.abs(np.abs(unit[:, 2]) - 1.0) <= z_tolerance))
+    return [edges[i] for i, keep in zip(candidates, mask) if keep]
+
+def _map_leg2_uv(corner_points, hole_center_y, hole_center_z, extrude_length, leg2_length, u_min, u_max, v_min, v_max):
+    """
+    Map a hole position on leg2 (Y along the length, Z along the height) to face parameters.
+
+    corner_points are the face points at (u_min, v_min), (u_max, v_min),
+    (u_min, v_max) and (u_max, v_max). The parameter direction with the larger
+    Y variation is taken as the length direction.
+
+    Returns (u_param, v_param, u_normalized, v_normalized, variations), where
+    variations is (y_variation_u, y_variation_v, z_variation_u, z_variation_v).
+    """
+    # Determine which parameter direction corresponds to Y (length) and Z (height)
+    corners = np.array([tuple(point) for point in corner_points], dtype=float)
+    variation_u = np.abs(corners[1] - corners[0])  # u_max vs u_min at v_min
+    variation_v = np.abs(corners[2] - corners[0])  # v_max vs v_min at u_min
+    y_variation_u, z_variation_u = float(variation_u[1]), float(variation_u[2])
+    y_variation_v, z_variation_v = float(variation_v[1]), float(variation_v[2])
+
+    # Determine correct parameter mapping
+    if y_variation_u > y_variation_v:
+        # U parameter corresponds to Y direction (length)
+        # V parameter corresponds to Z direction (height on leg2)
+        u_normalized = hole_center_y / extrude_length
+        v_normalized = hole_center_z / leg2_length
+    else:
+        # V parameter corresponds to Y direction (length)
+        # U parameter corresponds to Z direction (height on leg2)
+        u_normalized = hole_center_z / leg2_length
+        v_normalized = hole_center_y / extrude_length
+
+    # Map to face parameter range
+    u_param = u_min + u_normalized * (u_max - u_min)
+    v_param = v_min + v_normalized * (v_max - v_min)
+
+    variations = (y_variation_u, y_variation_v, z_variation_u, z_variation_v)
+    return u_param, v_param, u_normalized, v_normalized, variations
+
+def _fillet_bisect(shape, radius, edges):
+    """
+    Fillet as many of the given edges as possible.
+
+    The whole list is tried first. If OCC rejects it, the list is split in half
+    and each half is retried on the result of the previous one, so only the
+    sub-lists containing failing edges are subdivided down to single edges.
+
+    Returns (shape, number_of_filleted_edges); shape is unchanged if none succeed.
+    """
+    if not edges:
+        return shape, 0
+    try:
+        return shape.makeFillet(radius, edges), len(edges)
+    except Exception:
+        if len(edges) == 1:
+            return shape, 0
+    mid = len(edges) // 2
+    shape, first_count = _fillet_bisect(shape, radius, edges[:mid])
+    shape, second_count = _fillet_bisect(shape, radius, edges[mid:])
+    return shape, first_count + second_count
+
+# Primitive shape caches. Parameters are rounded so that float noise does not
+# defeat the cache; callers always receive a copy they are free to modify.
+_PRIMITIVE_CACHE_SIZE = 64
+
+def _round_key(*values):
+    return tuple(round(float(value), 6) for value in values)
+
+@functools.lru_cache(maxsize=_PRIMITIVE_CACHE_SIZE)
+def _cached_box(length, width, height):
+    return Part.makeBox(length, width, height)
+
+def _make_box(length, width, height):
+    """Return a copy of a cached Part.makeBox(length, width, height)."""
+    return _cached_box(*_round_key(length, width, height)).copy()
+
+@functools.lru_cache(maxsize=_PRIMITIVE_CACHE_SIZE)
+def _cached_cylinder(radius, height):
+    return Part.makeCylinder(radius, height)
+
+def _make_cylinder(radius, height):
+    """Return a copy of a cached Part.makeCylinder(radius, height) at the origin, along +Z."""
+    return _cached_cylinder(*_round_key(radius, height)).copy()
+
+@functools.lru_cache(maxsize=_PRIMITIVE_CACHE_SIZE)
+def _cached_tub_shape(thickness, radius, width, length, height):
+    return SheetMetalBaseShapeCmd.smCreateBaseShape(
+        type="Tub",
+        thickness=thickness,
+        radius=radius,
+        width=width,
+        length=length,
+        height=height,
+        flangeWidth=0,
+        fillGaps=True,
+        origin="0,0"
+    )
+
+def _make_tub_shape(thickness, radius, width, length, height):
+    """Return a copy of a cached SheetMetal "Tub" base shape."""
+    return _cached_tub_shape(*_round_key(thickness, radius, width, length, height)).copy()
+
 def create_square_tube_angled_cuts(tube_shape, length, outer_width, outer_height, left_cut_angle=45.0, right_cut_angle=60.0):
     """
     Apply angled cuts to both ends of the tube.
@@ -33,30 +233,16 @@ def create_square_tube_angled_cuts(tube_shape, length, outer_width, outer_height
     Returns:
         Part.Shape: The tube shape with angled cuts applied
     """
-    # Convert angles to radians
-    left_cut_angle_rad = math.radians(left_cut_angle)
-    right_cut_angle_rad = math.radians(right_cut_angle)
-
     # Skip 0-degree and 90-degree cuts to avoid division by zero (tan(0°) = 0, tan(90°) = infinity)
-    if abs(left_cut_angle) < 0.001:
-        print(f"Skipping left cut: angle {left_cut_angle}° is too close to 0°")
-        left_cut_enabled = False
-    elif abs(left_cut_angle - 90.0) < 0.001:
-        print(f"Skipping left cut: angle {left_cut_angle}° is too close to 90°")
-        left_cut_enabled = False
-    else:
-        left_cut_length_offset = outer_height / math.tan(left_cut_angle_rad)
-        left_cut_enabled = True
-
-    if abs(right_cut_angle) < 0.001:
-        print(f"Skipping right cut: angle {right_cut_angle}° is too close to 0°")
-        right_cut_enabled = False
-    elif abs(right_cut_angle - 90.0) < 0.001:
-        print(f"Skipping right cut: angle {right_cut_angle}° is too close to 90°")
-        right_cut_enabled = False
-    else:
-        right_cut_length_offset = outer_height / math.tan(right_cut_angle_rad)
-        right_cut_enabled = True
+    left_cut_length_offset = _cut_offset(outer_height, left_cut_angle)
+    left_cut_enabled = left_cut_length_offset is not None
+    if not left_cut_enabled:
+        print(f"Skipping left cut: angle {left_cut_angle}° is too close to 0° or 90°")
+
+    right_cut_length_offset = _cut_offset(outer_height, right_cut_angle)
+    right_cut_enabled = right_cut_length_offset is not None
+    if not right_cut_enabled:
+        print(f"Skipping right cut: angle {right_cut_angle}° is too close to 0° or 90°")
 
     # Create cutting plane at the left end (x=0) if enabled
     if left_cut_enabled:
@@ -116,33 +302,19 @@ def create_circular_tube_angled_cuts(tube_shape, length, outer_diameter, cut_ang
     Returns:
         Part.Shape: The tube shape with angled cuts applied
     """
-    # Convert angles to radians
-    cut_angle_1_rad = math.radians(cut_angle_1_deg)
-    cut_angle_2_rad = math.radians(cut_angle_2_deg)
-
     # Calculate the length of the bevel based on tube radius and angle for each end
     tube_radius = outer_diameter / 2
 
     # Skip 0-degree and 90-degree cuts to avoid division by zero (tan(0°) = 0, tan(90°) = infinity)
-    if abs(cut_angle_1_deg) < 0.001:
-        print(f"Skipping first cut: angle {cut_angle_1_deg}° is too close to 0°")
-        cut_1_enabled = False
-    elif abs(cut_angle_1_deg - 90.0) < 0.001:
-        print(f"Skipping first cut: angle {cut_angle_1_deg}° is too close to 90°")
-        cut_1_enabled = False
-    else:
-        bevel_length_1 = tube_radius / math.tan(cut_angle_1_rad)
-        cut_1_enabled = True
-
-    if abs(cut_angle_2_deg) < 0.001:
-        print(f"Skipping second cut: angle {cut_angle_2_deg}° is too close to 0°")
-        cut_2_enabled = False
-    elif abs(cut_angle_2_deg - 90.0) < 0.001:
-        print(f"Skipping second cut: angle {cut_angle_2_deg}° is too close to 90°")
-        cut_2_enabled = False
-    else:
-        bevel_length_2 = tube_radius / math.tan(cut_angle_2_rad)
-        cut_2_enabled = True
+    bevel_length_1 = _cut_offset(tube_radius, cut_angle_1_deg)
+    cut_1_enabled = bevel_length_1 is not None
+    if not cut_1_enabled:
+        print(f"Skipping first cut: angle {cut_angle_1_deg}° is too close to 0° or 90°")
+
+    bevel_length_2 = _cut_offset(tube_radius, cut_angle_2_deg)
+    cut_2_enabled = bevel_length_2 is not None
+    if not cut_2_enabled:
+        print(f"Skipping second cut: angle {cut_angle_2_deg}° is too close to 0° or 90°")
 
     # Create cutting boxes that will create the beveled ends
     box_size = outer_diameter * 3
@@ -224,6 +396,12 @@ def add_hole_leg1(bracket_shape, hole_radius, hole_center_x, hole_center_y, extr
     - leg1_length: Length of leg1
     """
 
+    if bracket_shape is None or bracket_shape.isNull():
+        raise ValueError("bracket_shape cannot be empty")
+
+    # Face normals/areas are shared by every drilling call on the same shape
+    faces, normals, areas, _ = _get_face_index(bracket_shape)
+
     # Find leg1 face (horizontal base face)
     leg1_face = None
     max_area = 0
@@ -236,46 +414,36 @@ def add_hole_leg1(bracket_shape, hole_radius, hole_center_x, hole_center_y, extr
 
     print(f"Looking for leg1 face with expected normal: ({expected_normal_x:.3f}, {expected_normal_y:.3f}, {expected_normal_z:.3f})")
 
-    for face in bracket_shape.Faces:
-        # Get face normal at center
-        u_mid = (face.ParameterRange[0] + face.ParameterRange[1]) / 2
-        v_mid = (face.ParameterRange[2] + face.ParameterRange[3]) / 2
-        normal = face.normalAt(u_mid, v_mid)
+    # Loop invariants
+    tolerance = 0.3
+    min_area = leg1_length * extrude_length * 0.5
 
+    for face, (nx, ny, nz), area in zip(faces, normals.tolist(), areas.tolist()):
         # Calculate match score (distance from expected normal)
-        normal_diff_x = abs(normal.x - expected_normal_x)
-        normal_diff_y = abs(normal.y - expected_normal_y)
-        normal_diff_z = abs(normal.z - expected_normal_z)
-        match_score = normal_diff_x + normal_diff_y + normal_diff_z
-
-        # Also try the opposite normal direction (faces can have flipped normals)
-        normal_diff_x_flip = abs(normal.x - expected_normal_x)
-        normal_diff_y_flip = abs(normal.y - expected_normal_y)
-        normal_diff_z_flip = abs(normal.z + expected_normal_z)  # Try negative Z
-        match_score_flip = normal_diff_x_flip + normal_diff_y_flip + normal_diff_z_flip
-
-        final_match_score = min(match_score, match_score_flip)
+        # X/Y terms are shared; only Z is also tried flipped (faces can have flipped normals)
+        shared_xy = abs(nx - expected_normal_x) + abs(ny - expected_normal_y)
+        final_match_score = shared_xy + min(abs(nz - expected_normal_z),
+                                            abs(nz + expected_normal_z))
 
         # Consider faces with reasonable area and good normal match
-        tolerance = 0.3
-        expected_area = leg1_length * extrude_length
-        if final_match_score < tolerance and face.Area > expected_area * 0.5:
+        if final_match_score < tolerance and area > min_area:
             if final_match_score < best_match_score:
                 best_match_score = final_match_score
                 leg1_face = face
-                print(f"Found potential leg1 face: area={face.Area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f}), score={final_match_score:.3f}")
+                print(f"Found potential leg1 face: area={area:.1f}, normal=({nx:.3f}, {ny:.3f}, {nz:.3f}), score={final_match_score:.3f}")
 
     # Fallback: find largest horizontal face
     if leg1_face is None:
         print("Could not find leg1 face by normal vector, using fallback method")
-        for face in bracket_shape.Faces:
+        fallback_min_area = leg1_length * extrude_length * 0.3
+        for face, area in zip(faces, areas):
             normal = face.normalAt(0, 0)
             # Look for horizontal faces (high Z component in normal)
             if (abs(normal.z) > 0.7 and
-                face.Area > max_area and face.Area > leg1_length * extrude_length * 0.3):
-                max_area = face.Area
+                area > max_area and area > fallback_min_area):
+                max_area = area
                 leg1_face = face
-                print(f"Fallback: selected face with area={face.Area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f})")
+                print(f"Fallback: selected face with area={area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f})")
 
     if leg1_face is None:
         print("Could not find suitable leg1 face")
@@ -356,7 +524,8 @@ def add_hole_leg1(bracket_shape, hole_radius, hole_center_x, hole_center_y, extr
     cylinder_height = thickness * 1.5  # Add 1mm extra to ensure complete cut
 
     # Position cylinder to start below the face surface to ensure complete cut
-    cylinder_start = hole_position - normal * (thickness)
+    offset = normal * thickness
+    cylinder_start = hole_position - offset
 
     hole_cylinder = Part.makeCylinder(
         hole_radius,
@@ -401,10 +570,15 @@ def add_countersink_leg2(bracket_shape, hole_radius, cs_radius, cs_angle, hole_c
     - leg2_length: Length of leg2
     """
 
+    if bracket_shape is None or bracket_shape.isNull():
+        raise ValueError("bracket_shape cannot be empty")
+
+    # Face normals/areas are shared by every drilling call on the same shape
+    faces, normals, areas, _ = _get_face_index(bracket_shape)
+
     # Find leg2 face (angled face) - same logic as add_hole_leg2
     leg2_face = None
     max_area = 0
-    best_match_score = float('inf')
 
     # Calculate expected normal vector for leg2 face
     angle_rad = math.radians(angle_deg)
@@ -416,45 +590,30 @@ def add_countersink_leg2(bracket_shape, hole_radius, cs_radius, cs_angle, hole_c
 
     print(f"Looking for leg2 face with expected normal: ({expected_normal_x:.3f}, {expected_normal_y:.3f}, {expected_normal_z:.3f})")
 
-    for face in bracket_shape.Faces:
-        # Get face normal at center
-        u_mid = (face.ParameterRange[0] + face.ParameterRange[1]) / 2
-        v_mid = (face.ParameterRange[2] + face.ParameterRange[3]) / 2
-        normal = face.normalAt(u_mid, v_mid)
-
-        # Calculate match score (distance from expected normal)
-        normal_diff_x = abs(normal.x - expected_normal_x)
-        normal_diff_y = abs(normal.y - expected_normal_y)
-        normal_diff_z = abs(normal.z - expected_normal_z)
-        match_score = normal_diff_x + normal_diff_y + normal_diff_z
-
-        # Also try the opposite normal direction (faces can have flipped normals)
-        normal_diff_x_flip = abs(normal.x + expected_normal_x)
-        normal_diff_y_flip = abs(normal.y + expected_normal_y)
-        normal_diff_z_flip = abs(normal.z + expected_normal_z)
-        match_score_flip = normal_diff_x_flip + normal_diff_y_flip + normal_diff_z_flip
-
-        final_match_score = min(match_score, match_score_flip)
+    # Loop invariants
+    tolerance = 0.3  # Increased tolerance for better matching
+    min_area = leg2_length * extrude_length * 0.5
 
-        # Consider faces with reasonable area and good normal match
-        tolerance = 0.3  # Increased tolerance for better matching
-        if final_match_score < tolerance and face.Area > leg2_length * extrude_length * 0.5:
-            if final_match_score < best_match_score:
-                best_match_score = final_match_score
-                leg2_face = face
-                print(f"Found potential leg2 face: area={face.Area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f}), score={final_match_score:.3f}")
+    # Score all faces at once (faces can have flipped normals) and keep the best match
+    best_index, best_match_score = _best_face_by_normal(
+        normals, areas, (expected_normal_x, expected_normal_y, expected_normal_z), min_area, tolerance)
+    if best_index is not None:
+        leg2_face = faces[best_index]
+        nx, ny, nz = normals[best_index]
+        print(f"Found potential leg2 face: area={areas[best_index]:.1f}, normal=({nx:.3f}, {ny:.3f}, {nz:.3f}), score={best_match_score:.3f}")
 
     # Fallback: find largest face that is not horizontal (base) or vertical (sides)
     if leg2_face is None:
         print("Could not find leg2 face by normal vector, using fallback method")
-        for face in bracket_shape.Faces:
+        fallback_min_area = leg2_length * extrude_length * 0.3
+        for face, area in zip(faces, areas):
             normal = face.normalAt(0, 0)
             # Skip horizontal faces (base/top) and purely vertical faces (sides)
             if (abs(normal.z) < 0.9 and abs(normal.x) > 0.1 and
-                face.Area > max_area and face.Area > leg2_length * extrude_length * 0.3):
-                max_area = face.Area
+                area > max_area and area > fallback_min_area):
+                max_area = area
                 leg2_face = face
-                print(f"Fallback: selected face with area={face.Area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f})")
+                print(f"Fallback: selected face with area={area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f})")
 
     if leg2_face is None:
         print("Could not find suitable leg2 face")
@@ -462,21 +621,21 @@ def add_countersink_leg2(bracket_shape, hole_radius, cs_radius, cs_angle, hole_c
 
     print(f"Found leg2 face with area: {leg2_face.Area}")
 
+    # Get face bounds in parameter space (read once, reused below)
+    u_min, u_max, v_min, v_max = leg2_face.ParameterRange
+
     # Find center point of leg2 face for reference
-    u_mid = (leg2_face.ParameterRange[0] + leg2_face.ParameterRange[1]) / 2
-    v_mid = (leg2_face.ParameterRange[2] + leg2_face.ParameterRange[3]) / 2
+    u_mid = (u_min + u_max) / 2
+    v_mid = (v_min + v_max) / 2
     face_center = leg2_face.valueAt(u_mid, v_mid)
-    normal = leg2_face.normalAt(u_mid, v_mid)
+    normal_mid = leg2_face.normalAt(u_mid, v_mid)
 
     print(f"Center point of leg2: {face_center}")
-    print(f"Normal vector of leg2: {normal}")
+    print(f"Normal vector of leg2: {normal_mid}")
 
     # Calculate hole position directly on the leg2 face surface
     # Use the face's parameter space to find the correct position
 
-    # Get face bounds in parameter space
-    u_min, u_max, v_min, v_max = leg2_face.ParameterRange
-
     # Test corner points to understand face parameter mapping
     corner_points = [
         leg2_face.valueAt(u_min, v_min),
@@ -491,35 +650,18 @@ def add_countersink_leg2(bracket_shape, hole_radius, cs_radius, cs_angle, hole_c
     print(f"  (u_min, v_max): {corner_points[2]}")
     print(f"  (u_max, v_max): {corner_points[3]}")
 
-    # Determine which parameter direction corresponds to Y (length) and Z (height)
-    # Check variation in Y direction between corner points
-    y_variation_u = abs(corner_points[1].y - corner_points[0].y)  # u_max vs u_min at v_min
-    y_variation_v = abs(corner_points[2].y - corner_points[0].y)  # v_max vs v_min at u_min
-
-    # Check variation in Z direction between corner points
-    z_variation_u = abs(corner_points[1].z - corner_points[0].z)  # u_max vs u_min at v_min
-    z_variation_v = abs(corner_points[2].z - corner_points[0].z)  # v_max vs v_min at u_min
+    # Map the (Y, Z) hole position on leg2 to face parameters
+    u_param, v_param, u_normalized, v_normalized, variations = _map_leg2_uv(
+        corner_points, hole_center_y, hole_center_z, extrude_length, leg2_length,
+        u_min, u_max, v_min, v_max)
+    y_variation_u, y_variation_v, z_variation_u, z_variation_v = variations
 
     print(f"Parameter variations: Y_u={y_variation_u:.3f}, Y_v={y_variation_v:.3f}, Z_u={z_variation_u:.3f}, Z_v={z_variation_v:.3f}")
-
-    # Determine correct parameter mapping
     if y_variation_u > y_variation_v:
-        # U parameter corresponds to Y direction (length)
-        # V parameter corresponds to Z direction (height on leg2)
-        u_normalized = hole_center_y / extrude_length
-        v_normalized = hole_center_z / leg2_length
         print("Mapping: U->Y (length), V->Z (height)")
     else:
-        # V parameter corresponds to Y direction (length)
-        # U parameter corresponds to Z direction (height on leg2)
-        u_normalized = hole_center_z / leg2_length
-        v_normalized = hole_center_y / extrude_length
         print("Mapping: U->Z (height), V->Y (length)")
 
-    # Map to face parameter range
-    u_param = u_min + u_normalized * (u_max - u_min)
-    v_param = v_min + v_normalized * (v_max - v_min)
-
     # Get the actual 3D position on the face surface
     hole_position = leg2_face.valueAt(u_param, v_param)
 
@@ -533,7 +675,8 @@ def add_countersink_leg2(bracket_shape, hole_radius, cs_radius, cs_angle, hole_c
 
     # Create main hole cylinder
     cylinder_height = thickness  # Make it a bit longer to ensure complete cut
-    cylinder_start = hole_position - normal * (cylinder_height)
+    offset = normal * cylinder_height
+    cylinder_start = hole_position - offset
 
     hole_cylinder = Part.makeCylinder(
         hole_radius,
@@ -620,7 +763,7 @@ def add_countersink_leg2(bracket_shape, hole_radius, cs_radius, cs_angle, hole_c
         print(f"Error creating countersink hole: {e}")
         return bracket_shape
 
-def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angle_deg, extrude_length, thickness, leg2_length):
+def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angle_deg, extrude_length, thickness, leg2_length, debug=False):
     """
     Add hole on leg2 face of L-bracket with any angle
 
@@ -633,15 +776,21 @@ def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angl
     - extrude_length: Extrude length
     - thickness: Sheet thickness
     - leg2_length: Length of leg2
+    - debug: Add the cutting cylinder to the active document as "HoleLeg2Debug" - default False
 
     Returns:
     - Modified bracket shape with hole cut from leg2
     """
 
+    if bracket_shape is None or bracket_shape.isNull():
+        raise ValueError("bracket_shape cannot be empty")
+
+    # Face normals/areas are shared by every drilling call on the same shape
+    faces, normals, areas, _ = _get_face_index(bracket_shape)
+
     # Find leg2 face (angled face) - same logic as add_countersink_leg2
     leg2_face = None
     max_area = 0
-    best_match_score = float('inf')
 
     # Calculate expected normal vector for leg2 face
     angle_rad = math.radians(angle_deg)
@@ -651,69 +800,56 @@ def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angl
     expected_normal_z = math.cos(angle_rad)
     expected_normal_y = 0.0
 
-    print(f"Looking for leg2 face with expected normal: ({expected_normal_x:.3f}, {expected_normal_y:.3f}, {expected_normal_z:.3f})")
+    logger.debug("Looking for leg2 face with expected normal: (%.3f, %.3f, %.3f)",
+                 expected_normal_x, expected_normal_y, expected_normal_z)
 
-    for face in bracket_shape.Faces:
-        # Get face normal at center
-        u_mid = (face.ParameterRange[0] + face.ParameterRange[1]) / 2
-        v_mid = (face.ParameterRange[2] + face.ParameterRange[3]) / 2
-        normal = face.normalAt(u_mid, v_mid)
+    # Loop invariants
+    tolerance = 0.3  # Increased tolerance for better matching
+    min_area = leg2_length * extrude_length * 0.5
 
-        # Calculate match score (distance from expected normal)
-        normal_diff_x = abs(normal.x - expected_normal_x)
-        normal_diff_y = abs(normal.y - expected_normal_y)
-        normal_diff_z = abs(normal.z - expected_normal_z)
-        match_score = normal_diff_x + normal_diff_y + normal_diff_z
-
-        # Also try the opposite normal direction (faces can have flipped normals)
-        normal_diff_x_flip = abs(normal.x + expected_normal_x)
-        normal_diff_y_flip = abs(normal.y + expected_normal_y)
-        normal_diff_z_flip = abs(normal.z + expected_normal_z)
-        match_score_flip = normal_diff_x_flip + normal_diff_y_flip + normal_diff_z_flip
-
-        final_match_score = min(match_score, match_score_flip)
-
-        # Consider faces with reasonable area and good normal match
-        tolerance = 0.3  # Increased tolerance for better matching
-        if final_match_score < tolerance and face.Area > leg2_length * extrude_length * 0.5:
-            if final_match_score < best_match_score:
-                best_match_score = final_match_score
-                leg2_face = face
-                print(f"Found potential leg2 face: area={face.Area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f}), score={final_match_score:.3f}")
+    # Score all faces at once (faces can have flipped normals) and keep the best match
+    best_index, best_match_score = _best_face_by_normal(
+        normals, areas, (expected_normal_x, expected_normal_y, expected_normal_z), min_area, tolerance)
+    if best_index is not None:
+        leg2_face = faces[best_index]
+        nx, ny, nz = normals[best_index]
+        logger.debug("Found potential leg2 face: area=%.1f, normal=(%.3f, %.3f, %.3f), score=%.3f",
+                     areas[best_index], nx, ny, nz, best_match_score)
 
     # Fallback: find largest face that is not horizontal (base) or vertical (sides)
     if leg2_face is None:
-        print("Could not find leg2 face by normal vector, using fallback method")
-        for face in bracket_shape.Faces:
+        logger.debug("Could not find leg2 face by normal vector, using fallback method")
+        fallback_min_area = leg2_length * extrude_length * 0.3
+        for face, area in zip(faces, areas):
             normal = face.normalAt(0, 0)
             # Skip horizontal faces (base/top) and purely vertical faces (sides)
             if (abs(normal.z) < 0.9 and abs(normal.x) > 0.1 and
-                face.Area > max_area and face.Area > leg2_length * extrude_length * 0.3):
-                max_area = face.Area
+                area > max_area and area > fallback_min_area):
+                max_area = area
                 leg2_face = face
-                print(f"Fallback: selected face with area={face.Area:.1f}, normal=({normal.x:.3f}, {normal.y:.3f}, {normal.z:.3f})")
+                logger.debug("Fallback: selected face with area=%.1f, normal=(%.3f, %.3f, %.3f)",
+                             area, normal.x, normal.y, normal.z)
 
     if leg2_face is None:
         print("Could not find suitable leg2 face")
         return bracket_shape
 
-    print(f"Found leg2 face with area: {leg2_face.Area}")
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
 
-    # Find center point of leg2 face for reference
-    u_mid = (leg2_face.ParameterRange[0] + leg2_face.ParameterRange[1]) / 2
-    v_mid = (leg2_face.ParameterRange[2] + leg2_face.ParameterRange[3]) / 2
-    face_center = leg2_face.valueAt(u_mid, v_mid)
-    normal = leg2_face.normalAt(u_mid, v_mid)
+    # Get face bounds in parameter space (read once, reused below)
+    u_min, u_max, v_min, v_max = leg2_face.ParameterRange
 
-    print(f"Center point of leg2: {face_center}")
-    print(f"Normal vector of leg2: {normal}")
+    if debug_enabled:
+        # Center point of leg2 face, for reference only
+        u_mid = (u_min + u_max) / 2
+        v_mid = (v_min + v_max) / 2
+        logger.debug("Found leg2 face with area: %s", leg2_face.Area)
+        logger.debug("Center point of leg2: %s", leg2_face.valueAt(u_mid, v_mid))
+        logger.debug("Normal vector of leg2: %s", leg2_face.normalAt(u_mid, v_mid))
 
     # Calculate hole position directly on the leg2 face surface
     # Use the face's parameter space to find the correct position
 
-    # Get face bounds in parameter space
-    u_min, u_max, v_min, v_max = leg2_face.ParameterRange
-
     # Test corner points to understand face parameter mapping
     corner_points = [
         leg2_face.valueAt(u_min, v_min),
@@ -722,48 +858,32 @@ def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angl
         leg2_face.valueAt(u_max, v_max)
     ]
 
-    print(f"Face corner points:")
-    print(f"  (u_min, v_min): {corner_points[0]}")
-    print(f"  (u_max, v_min): {corner_points[1]}")
-    print(f"  (u_min, v_max): {corner_points[2]}")
-    print(f"  (u_max, v_max): {corner_points[3]}")
-
-    # Determine which parameter direction corresponds to Y (length) and Z (height)
-    # Check variation in Y direction between corner points
-    y_variation_u = abs(corner_points[1].y - corner_points[0].y)  # u_max vs u_min at v_min
-    y_variation_v = abs(corner_points[2].y - corner_points[0].y)  # v_max vs v_min at u_min
+    if debug_enabled:
+        logger.debug("Face corner points: (u_min, v_min)=%s, (u_max, v_min)=%s, (u_min, v_max)=%s, (u_max, v_max)=%s",
+                     *corner_points)
 
-    # Check variation in Z direction between corner points
-    z_variation_u = abs(corner_points[1].z - corner_points[0].z)  # u_max vs u_min at v_min
-    z_variation_v = abs(corner_points[2].z - corner_points[0].z)  # v_max vs v_min at u_min
+    # Map the (Y, Z) hole position on leg2 to face parameters
+    u_param, v_param, u_normalized, v_normalized, variations = _map_leg2_uv(
+        corner_points, hole_center_y, hole_center_z, extrude_length, leg2_length,
+        u_min, u_max, v_min, v_max)
 
-    print(f"Parameter variations: Y_u={y_variation_u:.3f}, Y_v={y_variation_v:.3f}, Z_u={z_variation_u:.3f}, Z_v={z_variation_v:.3f}")
-
-    # Determine correct parameter mapping
-    if y_variation_u > y_variation_v:
-        # U parameter corresponds to Y direction (length)
-        # V parameter corresponds to Z direction (height on leg2)
-        u_normalized = hole_center_y / extrude_length
-        v_normalized = hole_center_z / leg2_length
-        print("Mapping: U->Y (length), V->Z (height)")
-    else:
-        # V parameter corresponds to Y direction (length)
-        # U parameter corresponds to Z direction (height on leg2)
-        u_normalized = hole_center_z / leg2_length
-        v_normalized = hole_center_y / extrude_length
-        print("Mapping: U->Z (height), V->Y (length)")
-
-    # Map to face parameter range
-    u_param = u_min + u_normalized * (u_max - u_min)
-    v_param = v_min + v_normalized * (v_max - v_min)
+    if debug_enabled:
+        y_variation_u, y_variation_v, z_variation_u, z_variation_v = variations
+        logger.debug("Parameter variations: Y_u=%.3f, Y_v=%.3f, Z_u=%.3f, Z_v=%.3f",
+                     y_variation_u, y_variation_v, z_variation_u, z_variation_v)
+        if y_variation_u > y_variation_v:
+            logger.debug("Mapping: U->Y (length), V->Z (height)")
+        else:
+            logger.debug("Mapping: U->Z (height), V->Y (length)")
 
     # Get the actual 3D position on the face surface
     hole_position = leg2_face.valueAt(u_param, v_param)
 
-    print(f"Face parameter range: U({u_min:.3f}, {u_max:.3f}), V({v_min:.3f}, {v_max:.3f})")
-    print(f"Normalized position: U={u_normalized:.3f}, V={v_normalized:.3f}")
-    print(f"Face parameters: U={u_param:.3f}, V={v_param:.3f}")
-    print(f"Hole position on face: {hole_position}")
+    if debug_enabled:
+        logger.debug("Face parameter range: U(%.3f, %.3f), V(%.3f, %.3f)", u_min, u_max, v_min, v_max)
+        logger.debug("Normalized position: U=%.3f, V=%.3f", u_normalized, v_normalized)
+        logger.debug("Face parameters: U=%.3f, V=%.3f", u_param, v_param)
+        logger.debug("Hole position on face: %s", hole_position)
 
     # Get the normal at this position for cylinder direction
     normal = leg2_face.normalAt(u_param, v_param)
@@ -772,7 +892,8 @@ def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angl
     cylinder_height = thickness
 
     # Position cylinder to start at the face surface
-    cylinder_start = hole_position - normal * (thickness)
+    offset = normal * thickness
+    cylinder_start = hole_position - offset
 
     hole_cylinder = Part.makeCylinder(
         hole_radius,
@@ -782,18 +903,17 @@ def add_hole_leg2(bracket_shape, hole_radius, hole_center_y, hole_center_z, angl
     )
 
     # Create cylinder object for debugging (optional)
-    if App.ActiveDocument:
+    if debug and App.ActiveDocument:
         hole_obj = App.ActiveDocument.addObject("Part::Feature", "HoleLeg2Debug")
         hole_obj.Shape = hole_cylinder
         hole_obj.Label = "Hole Cylinder Leg2"
-        print(f"Created cylinder with thickness: {cylinder_height}")
-        print(f"Cylinder start position: {cylinder_start}")
-        print(f"Cylinder direction (normal): {normal}")
+        logger.debug("Created cylinder with thickness: %s, start position: %s, direction (normal): %s",
+                     cylinder_height, cylinder_start, normal)
 
     try:
         # Cut cylinder from bracket
         result_shape = bracket_shape.cut(hole_cylinder)
-        print("Successfully created hole on leg2")
+        logger.debug("Successfully created hole on leg2")
         return result_shape
     except Exception as e:
         print(f"Error creating hole on leg2: {e}")
@@ -832,25 +952,36 @@ def create_holes_on_flange_capot(width, length, bend_radius, additional_bend_len
         (-x_coord, -y_coord, 0)     # Hole 4: -X, -Y
     ]
 
+    # Build one cylinder and place copies of it; setting Placement only changes
+    # the copy's location instead of rebuilding transformed topology
+    prototype = _make_cylinder(hole_radius, hole_height)
     cutting_cylinders = []
 
-    for i, (x, y, z) in enumerate(hole_positions):
-        # Create cylinder to cut hole
-        cylinder = Part.makeCylinder(hole_radius, hole_height)
-        # Move cylinder to position
-        cylinder = cylinder.translate(App.Vector(x, y, z))
+    for x, y, z in hole_positions:
+        cylinder = prototype.copy()
+        cylinder.Placement = App.Placement(App.Vector(x, y, z), App.Rotation())
         cutting_cylinders.append(cylinder)
 
     # Cut holes in tub
     modified_tub_shape = tub_obj.Shape
 
-    # Cut each hole sequentially
-    for i, cutting_cylinder in enumerate(cutting_cylinders):
-        try:
-            modified_tub_shape = modified_tub_shape.cut(cutting_cylinder)
-            print(f"Created hole {i+1} at position ({hole_positions[i][0]:.1f}, {hole_positions[i][1]:.1f})")
-        except Exception as e:
-            print(f"Error cutting hole {i+1}: {e}")
+    # Cut all holes with a single multi-tool boolean so OCC sets up the
+    # operation once instead of once per cylinder. The cutters are disjoint,
+    # so OCC's boolean can process them together; this is cheaper than cutting
+    # copies of the tub in worker processes and fusing the results back.
+    try:
+        modified_tub_shape = modified_tub_shape.cut(cutting_cylinders)
+        for i, (x, y, _) in enumerate(hole_positions):
+            print(f"Created hole {i+1} at position ({x:.1f}, {y:.1f})")
+    except Exception as e:
+        print(f"Error cutting holes in one pass: {e}, falling back to sequential cuts")
+        # Cut each hole sequentially
+        for i, cutting_cylinder in enumerate(cutting_cylinders):
+            try:
+                modified_tub_shape = modified_tub_shape.cut(cutting_cylinder)
+                print(f"Created hole {i+1} at position ({hole_positions[i][0]:.1f}, {hole_positions[i][1]:.1f})")
+            except Exception as e:
+                print(f"Error cutting hole {i+1}: {e}")
 
     # Update tub shape
     tub_obj.Shape = modified_tub_shape
@@ -868,7 +999,7 @@ def create_capot(thickness, bend_radius, width, length, height, fillet=0, additi
     - width: Width (mm)
     - length: Length (mm)
     - height: Height (mm)
-    - fillet: Fillet radius (mm) - 0 = no fillet
+    - fillet: Fillet radius (mm) - 0 = no fillet (returns before the edge scan)
     - additional_bend_length: Additional bend length (mm)
     - additional_bend_angle: Additional bend angle (degrees)
 
@@ -877,27 +1008,29 @@ def create_capot(thickness, bend_radius, width, length, height, fillet=0, additi
     """
 
 
-    tub_shape = SheetMetalBaseShapeCmd.smCreateBaseShape(
-        type="Tub",
-        thickness=thickness,
-        radius=bend_radius,
-        width=width + 2*bend_radius,
-        length=length + 2*bend_radius,
-        height=height,
-        flangeWidth=0,
-        fillGaps=True,
-        origin="0,0"
+    tub_shape = _make_tub_shape(
+        thickness,
+        bend_radius,
+        width + 2*bend_radius,
+        length + 2*bend_radius,
+        height
     )
 
     tub_obj = App.ActiveDocument.addObject("Part::Feature", "Tub_Base")
     tub_obj.Shape = tub_shape
     tub_obj.Label = "Tub_Base"
-    App.ActiveDocument.recompute()
 
     edge_candidates = ["Edge46", "Edge26"]
     wall_objects = []
 
+    # Sub-element names are 1-based indices into Shape.Edges; skip candidates
+    # the tub does not have instead of relying on SMBendWall to raise
+    valid_edges = {f"Edge{i+1}" for i in range(len(tub_shape.Edges))}
+
+    # Add all walls first and recompute the document once for all of them
     for i, edge in enumerate(edge_candidates):
+        if edge not in valid_edges:
+            continue
         try:
             wall_obj = App.ActiveDocument.addObject("Part::FeaturePython", f"SMBendWall_{i+1}")
             SheetMetalCmd.SMBendWall(wall_obj, tub_obj, [edge])
@@ -905,12 +1038,16 @@ def create_capot(thickness, bend_radius, width, length, height, fillet=0, additi
             wall_obj.length = additional_bend_length - bend_radius
             wall_obj.angle = (180 - additional_bend_angle)
             wall_obj.radius = bend_radius
-            App.ActiveDocument.recompute()
 
             wall_objects.append(wall_obj)
         except:
             pass
 
+    App.ActiveDocument.recompute()
+
+    # A wall whose recompute failed is left with a null shape
+    wall_objects = [wall_obj for wall_obj in wall_objects if not wall_obj.Shape.isNull()]
+
     if len(wall_objects) > 0:
         fused_shape = tub_obj.Shape
 
@@ -920,72 +1057,57 @@ def create_capot(thickness, bend_radius, width, length, height, fillet=0, additi
         fused_obj = App.ActiveDocument.addObject("Part::Feature", "Tub_With_Bends")
         fused_obj.Shape = fused_shape
         fused_obj.Label = "Tub_With_Bends"
-        App.ActiveDocument.recompute()
 
         current_obj = fused_obj
     else:
         current_obj = tub_obj
 
+    # Fast path: without a fillet there is no need to enumerate Shape.Edges
     if fillet <= 0:
         return current_obj
 
-    edges_to_fillet = []
     thickness_tolerance = 1e-3
     z_direction_tolerance = 1e-3
 
-    for edge in current_obj.Shape.Edges:
-        if abs(edge.Length - thickness) <= thickness_tolerance:
-            if hasattr(edge, 'Vertexes') and len(edge.Vertexes) >= 2:
-                v1 = edge.Vertexes[0].Point
-                v2 = edge.Vertexes[1].Point
-                direction = v2.sub(v1)
-
-                if direction.Length > 1e-6:
-                    normalized_direction = direction.normalize()
-                    is_parallel_to_z = (abs(normalized_direction.x) <= z_direction_tolerance and
-                                       abs(normalized_direction.y) <= z_direction_tolerance and
-                                       abs(abs(normalized_direction.z) - 1.0) <= z_direction_tolerance)
-
-                    if is_parallel_to_z:
-                        edges_to_fillet.append(edge)
+    edges_to_fillet = _select_edges_by_length(current_obj.Shape.Edges, thickness,
+                                              thickness_tolerance, z_direction_tolerance)
 
     if len(edges_to_fillet) == 0:
         return current_obj
 
-    filleted_shape = None
-    successful_fillets = 0
-    temp_shape = current_obj.Shape
+    filleted_shape, successful_fillets = _fillet_bisect(current_obj.Shape, fillet, edges_to_fillet)
 
-    try:
-        filleted_shape = current_obj.Shape.makeFillet(fillet, edges_to_fillet)
-        successful_fillets = len(edges_to_fillet)
-    except:
-        batch_size = 5
-        for i in range(0, len(edges_to_fillet), batch_size):
-            batch_edges = edges_to_fillet[i:i+batch_size]
-            try:
-                temp_shape = temp_shape.makeFillet(fillet, batch_edges)
-                successful_fillets += len(batch_edges)
-            except:
-                for edge in batch_edges:
-                    try:
-                        temp_shape = temp_shape.makeFillet(fillet, [edge])
-                        successful_fillets += 1
-                    except:
-                        pass
-
-        if successful_fillets > 0:
-            filleted_shape = temp_shape
-
-    if filleted_shape is not None and successful_fillets > 0:
+    if successful_fillets > 0:
         filleted_obj = App.ActiveDocument.addObject("Part::Feature", f"Tub_Final_R{fillet}")
         filleted_obj.Shape = filleted_shape
         filleted_obj.Label = f"Tub with {successful_fillets} Fillets (R{fillet})"
-        App.ActiveDocument.recompute()
         return filleted_obj
     else:
         return current_obj
 
+def _make_flange_90(thickness, bend_radius, flange_height, span):
+    """
+    Build a 90° bend and flange from primitives, without SMBendWall.
+
+    The result belongs to the top edge at X=0 of a plate lying in X >= 0,
+    0 <= Z <= thickness, running from Y=0 to Y=span: a quarter ring with inner
+    radius bend_radius around the axis (X=0, Z=thickness+bend_radius), followed
+    by a flange of flange_height rising in +Z on the X < 0 side. Callers mirror
+    it onto the other plate edges.
+    """
+    outer_radius = bend_radius + thickness
+    bend_center = App.Vector(0, 0, thickness + bend_radius)
+    axis = App.Vector(0, 1, 0)
+
+    ring = Part.makeCylinder(outer_radius, span, bend_center, axis).cut(
+        Part.makeCylinder(bend_radius, span, bend_center, axis))
+    quadrant = Part.makeBox(outer_radius, span, outer_radius, App.Vector(-outer_radius, 0, 0))
+    bend = ring.common(quadrant)
+
+    flange = Part.makeBox(thickness, span, flange_height,
+                          App.Vector(-outer_radius, 0, thickness + bend_radius))
+    return bend.fuse(flange)
+
 def create_u_shaped_plate(
     plate_length=60.0,
     plate_width=120.0,
@@ -993,7 +1115,9 @@ def create_u_shaped_plate(
     flange_height=20.0,
     bend_angle_deg=90.0,
     bend_radius=2.0,
-    bend_axis="Y"  # "X" or "Y" - which axis to bend along
+    bend_axis="Y",  # "X" or "Y" - which axis to bend along
+    doc=None,
+    fast_90_bend=False
 ):
     """
     Create a U-shaped plate with configurable bend axis.
@@ -1006,20 +1130,22 @@ def create_u_shaped_plate(
     - bend_angle_deg: Bend angle in degrees (90° for perpendicular flanges)
     - bend_radius: Bend radius
     - bend_axis: "X" to bend along X-axis edges, "Y" to bend along Y-axis edges
+    - doc: Existing document to add the objects to - default None creates a new one
+    - fast_90_bend: Build 90° bends from Part primitives instead of SMBendWall - default False
 
     Returns:
     - final_obj: The final FreeCAD object with the U-shaped plate
     """
 
-    # Create document with auto-generated name
-    doc_name = f"U_Shaped_Plate_{bend_axis.upper()}_Axis"
-    doc = App.newDocument(doc_name)
+    # Create document with auto-generated name unless the caller shares one
+    if doc is None:
+        doc_name = f"U_Shaped_Plate_{bend_axis.upper()}_Axis"
+        doc = App.newDocument(doc_name)
 
     # Create base plate
-    base_shape = Part.makeBox(plate_length, plate_width, thickness)
+    base_shape = _make_box(plate_length, plate_width, thickness)
     base_obj = doc.addObject("Part::Feature", "BasePlate")
     base_obj.Shape = base_shape
-    doc.recompute()
 
     # Determine edges based on bend axis
     if bend_axis.upper() == "X":
@@ -1037,28 +1163,42 @@ def create_u_shaped_plate(
 
     print(f"Creating U-shaped plate with flanges along {axis_description}")
 
-    # Create first flange
-    flange1_obj = doc.addObject("Part::FeaturePython", "SMBendWall1")
-    SheetMetalCmd.SMBendWall(flange1_obj, base_obj, [edge1])
-    flange1_obj.length = flange_height
-    flange1_obj.angle = 180 - bend_angle_deg  # SheetMetal uses supplementary angle
-    flange1_obj.radius = bend_radius
-
-    # Create second flange
-    flange2_obj = doc.addObject("Part::FeaturePython", "SMBendWall2")
-    SheetMetalCmd.SMBendWall(flange2_obj, base_obj, [edge2])
-    flange2_obj.length = flange_height
-    flange2_obj.angle = 180 - bend_angle_deg
-    flange2_obj.radius = bend_radius
+    if fast_90_bend and bend_angle_deg == 90.0 and bend_radius > 0:
+        # Primitive fast path: mirror the X=0 flange onto the requested edges
+        if bend_axis.upper() == "X":
+            flange1_shape = _make_flange_90(thickness, bend_radius, flange_height, plate_length)
+            flange1_shape = flange1_shape.mirror(App.Vector(0, 0, 0), App.Vector(1, -1, 0))
+            flange2_shape = flange1_shape.mirror(App.Vector(0, plate_width / 2, 0), App.Vector(0, 1, 0))
+        else:
+            flange1_shape = _make_flange_90(thickness, bend_radius, flange_height, plate_width)
+            flange2_shape = flange1_shape.mirror(App.Vector(plate_length / 2, 0, 0), App.Vector(1, 0, 0))
+
+        flange1_obj = doc.addObject("Part::Feature", "Flange1")
+        flange1_obj.Shape = flange1_shape
+        flange2_obj = doc.addObject("Part::Feature", "Flange2")
+        flange2_obj.Shape = flange2_shape
+    else:
+        # Create first flange
+        flange1_obj = doc.addObject("Part::FeaturePython", "SMBendWall1")
+        SheetMetalCmd.SMBendWall(flange1_obj, base_obj, [edge1])
+        flange1_obj.length = flange_height
+        flange1_obj.angle = 180 - bend_angle_deg  # SheetMetal uses supplementary angle
+        flange1_obj.radius = bend_radius
+
+        # Create second flange
+        flange2_obj = doc.addObject("Part::FeaturePython", "SMBendWall2")
+        SheetMetalCmd.SMBendWall(flange2_obj, base_obj, [edge2])
+        flange2_obj.length = flange_height
+        flange2_obj.angle = 180 - bend_angle_deg
+        flange2_obj.radius = bend_radius
 
-    doc.recompute()
+        doc.recompute()
 
     # Fuse plate + flanges
     try:
         fused_shape = base_obj.Shape.fuse(flange1_obj.Shape).fuse(flange2_obj.Shape)
         final_obj = doc.addObject("Part::Feature", "U_Shaped_Plate")
         final_obj.Shape = fused_shape
-        doc.recompute()
     except Exception as e:
         print(f"Warning: fusing failed - using compound. Reason: {e}")
         compound_shape = Part.makeCompound([base_obj.Shape,
@@ -1066,11 +1206,10 @@ def create_u_shaped_plate(
                                             flange2_obj.Shape])
         final_obj = doc.addObject("Part::Feature", "U_Shaped_Plate")
         final_obj.Shape = compound_shape
-        doc.recompute()
 
     return final_obj.Shape
 
-def create_l_shaped_plate(plate_length, plate_width, thickness, flange_height, bend_angle_deg, bend_radius, fillet_corner=0):
+def create_l_shaped_plate(plate_length, plate_width, thickness, flange_height, bend_angle_deg, bend_radius, fillet_corner=0, doc=None, fast_90_bend=False):
     """
     Creates an L-shaped plate using SheetMetal workbench.
 
@@ -1081,31 +1220,38 @@ def create_l_shaped_plate(plate_length, plate_width, thickness, flange_height, b
         flange_height: Flange / wing height
         bend_angle_deg: 90deg bend angle in degrees
         bend_radius: Radius of the bend
-        fillet_corner: Fillet radius for corner edges (0 = no fillet)
+        fillet_corner: Fillet radius for corner edges (0 = no fillet, edges are not scanned)
+        doc: Existing document to add the objects to (None = create a new document)
+        fast_90_bend: Build a 90deg bend from Part primitives instead of SMBendWall
 
     Returns:
         FreeCAD object containing the L-shaped plate
     """
-    # Create document
-    doc = App.newDocument("L_Shape_Bracket")
+    # Create document unless the caller shares one
+    if doc is None:
+        doc = App.newDocument("L_Shape_Bracket")
 
     # Create base box (base plate)
-    base_box = Part.makeBox(plate_length, plate_width, thickness)
+    base_box = _make_box(plate_length, plate_width, thickness)
     base_obj = doc.addObject("Part::Feature", "BaseBox")
     base_obj.Shape = base_box
     base_obj.Label = "Base Box"
-    doc.recompute()
-
-    # Create SMBendWall (flange)
-    wall_obj = doc.addObject("Part::FeaturePython", "SMBendWall")
-    edge = "Edge2"
-    wall_feature = SheetMetalCmd.SMBendWall(wall_obj, base_obj, [edge])
 
-    # Set properties for the bend
-    wall_obj.length = flange_height
-    wall_obj.angle = (180 - bend_angle_deg)
-    wall_obj.radius = bend_radius
-    doc.recompute()
+    if fast_90_bend and bend_angle_deg == 90.0 and bend_radius > 0:
+        # Primitive fast path for the flange on Edge2 (top edge at X=0)
+        wall_obj = doc.addObject("Part::Feature", "Flange")
+        wall_obj.Shape = _make_flange_90(thickness, bend_radius, flange_height, plate_width)
+    else:
+        # Create SMBendWall (flange)
+        wall_obj = doc.addObject("Part::FeaturePython", "SMBendWall")
+        edge = "Edge2"
+        wall_feature = SheetMetalCmd.SMBendWall(wall_obj, base_obj, [edge])
+
+        # Set properties for the bend
+        wall_obj.length = flange_height
+        wall_obj.angle = (180 - bend_angle_deg)
+        wall_obj.radius = bend_radius
+        doc.recompute()
 
     # Create final L-bracket by fusing base and wall
     try:
@@ -1113,24 +1259,19 @@ def create_l_shaped_plate(plate_length, plate_width, thickness, flange_height, b
         final_bracket_obj = doc.addObject("Part::Feature", "L_Bracket")
         final_bracket_obj.Shape = fused_shape
         final_bracket_obj.Label = "L-Bracket"
-        doc.recompute()
         print("Successfully created L-shaped bracket")
 
         # Apply fillet to corner edges if requested
         if fillet_corner > 0:
             try:
                 # Find vertical edges (edges with length equal to thickness)
-                edges_to_fillet = []
-                for edge in final_bracket_obj.Shape.Edges:
-                    if abs(edge.Length - thickness) < 1e-6:
-                        edges_to_fillet.append(edge)
+                edges_to_fillet = _select_edges_by_length(final_bracket_obj.Shape.Edges, thickness, 1e-6)
 
                 if len(edges_to_fillet) >= 4:
                     filleted_shape = final_bracket_obj.Shape.makeFillet(fillet_corner, edges_to_fillet)
                     filleted_obj = doc.addObject("Part::Feature", "FilletedBracket")
                     filleted_obj.Shape = filleted_shape
                     filleted_obj.Label = "L-Bracket with Fillets"
-                    doc.recompute()
                     print(f"Successfully applied fillets with radius {fillet_corner}mm to {len(edges_to_fillet)} edges")
                     return filleted_obj
                 else:
@@ -1147,7 +1288,6 @@ def create_l_shaped_plate(plate_length, plate_width, thickness, flange_height, b
         final_bracket_obj = doc.addObject("Part::Feature", "L_Bracket")
         final_bracket_obj.Shape = bracket_shape
         final_bracket_obj.Label = "L-Bracket"
-        doc.recompute()
         print("Created L-shaped bracket as compound shape")
         return final_bracket_obj
 
@@ -2,30 +2,66 @@ import uuid
 import os
 import tempfile
 import shutil
+from collections import OrderedDict
 from datetime import datetime, timezone
 import time
-from flask import Flask, request, jsonify, send_file
+import unicodedata
+from urllib.parse import quote
+from flask import Flask, Response, request, jsonify, make_response, send_file
+from flask.json.provider import JSONProvider
 from flask_restx import Api, Resource, fields, Namespace
-from redis import Redis
+from redis import BlockingConnectionPool, Redis
 from rq import Queue
 from rq.job import Job
+from rq.exceptions import NoSuchJobError
 from dotenv import load_dotenv
-from werkzeug.datastructures import FileStorage
+from werkzeug.datastructures import FileStorage, Headers
 import threading
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 
 import config
+from downloads import x_accel_redirect_uri
 from mqtt_client import get_mqtt_manager
 
 load_dotenv()
 
+# Public base URL for download links
+_BASE_URL = os.getenv('API_BASE_URL', f'http://{config.API_HOST}:{config.API_PORT}')
+
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=ORJSON_OPTIONS, default=str).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# With X-Sendfile the front-end server reads the file; send_file only sets the header
+app.config["USE_X_SENDFILE"] = config.DOWNLOAD_OFFLOAD == "x-sendfile"
 api = Api(app, 
           title='FreeCAD Model Generator API',
           version='1.0',
           description='API to create FreeCAD models through worker queue with scalability',
           doc='/swagger/')
 
-redis_conn = Redis.from_url(config.REDIS_URL)
+# Bounded pool shared by all request threads; a thread waits up to
+# REDIS_POOL_TIMEOUT seconds for a free connection instead of failing
+redis_pool = BlockingConnectionPool.from_url(
+    config.REDIS_URL,
+    max_connections=config.REDIS_MAX_CONNECTIONS,
+    timeout=config.REDIS_POOL_TIMEOUT,
+    socket_keepalive=True,
+    socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+)
+redis_conn = Redis(connection_pool=redis_pool)
 queue = Queue(
     config.QUEUE_NAME,
     connection=redis_conn,
@@ -34,9 +70,51 @@ queue = Queue(
     failure_ttl=config.FAILURE_TTL,
 )
 
+# Worker threads for copying result files; copies are I/O bound and overlap well
+_COPY_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="file-copy")
+
+# Background publisher so /generate does not wait on broker I/O
+_MQTT_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mqtt-publish")
+
+# Secondary index: Redis hash mapping user_id -> latest job_id
+USER_JOB_INDEX_KEY = "user_job_index"
+
+# Short-lived in-process cache of resolved job ids, so polling clients do
+# not hit Redis on every request: user_id -> (job_id, expires_at).
+# Kept in insertion order so the oldest entries can be evicted past the cap.
+JOB_ID_CACHE_TTL = 5.0
+JOB_ID_CACHE_MAX = 10000
+_job_id_cache = OrderedDict()
+_job_id_cache_lock = threading.Lock()
+
 # Initialize MQTT manager
 mqtt_manager = get_mqtt_manager()
 
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    """Serialize Flask-RESTX responses with orjson"""
+    resp = make_response(orjson.dumps(data, option=ORJSON_OPTIONS, default=str), code)
+    resp.headers.extend(headers or {})
+    resp.mimetype = 'application/json'
+    return resp
+
+
+def _json_response(data, code=200):
+    """Serialize a flat dict straight to a JSON response, skipping RESTX marshalling"""
+    return app.response_class(orjson.dumps(data, option=ORJSON_OPTIONS, default=str), status=code, mimetype='application/json')
+
+
+def _attachment_headers(filename):
+    """Content-Disposition for a download, quoted the same way send_file builds it"""
+    ascii_name = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+    options = {"filename": ascii_name}
+    if ascii_name != filename:
+        options["filename*"] = f"UTF-8''{quote(filename, safe='!#$&+^`|')}"
+    headers = Headers()
+    headers.set("Content-Disposition", "attachment", **options)
+    return headers
+
+
 # Swagger models
 freecad_ns = Namespace('freecad', description='FreeCAD model generation operations')
 api.add_namespace(freecad_ns)
@@ -47,6 +125,11 @@ upload_parser.add_argument('file', location='files', type=FileStorage, required=
 upload_parser.add_argument('user_id', location='form', type=str, required=True, help='User ID for job management')
 upload_parser.add_argument('auto_download', location='form', type=bool, required=False, help='If true, API will wait and return files immediately')
 
+# Batch upload parser: one user_id per file, matched by position
+batch_upload_parser = api.parser()
+batch_upload_parser.add_argument('files', location='files', type=FileStorage, action='append', required=True, help='FreeCAD Python script files (.py)')
+batch_upload_parser.add_argument('user_id', location='form', type=str, action='append', required=True, help='User ID for each file, in the same order as files')
+
 # Result parser with auto_download parameter
 result_parser = api.parser()
 result_parser.add_argument('auto_download', location='query', type=bool, required=False, help='If true, copy files to outputs/code/cad_outputs_generated/ and return download links. If false or not set, only return file information without copying.')
@@ -94,8 +177,133 @@ result_response = api.model('ResultResponse', {
 })
 
 
+# Last formatted second, reused while the clock stays within the same second
+_iso_now_cache = (0, "")
+
+
 def iso_now():
-    return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+    global _iso_now_cache
+    second = int(time.time())
+    cached_second, cached_iso = _iso_now_cache
+    if second == cached_second:
+        return cached_iso
+    iso = datetime.fromtimestamp(second, timezone.utc).isoformat()
+    _iso_now_cache = (second, iso)
+    return iso
+
+
+def _remember_job_id(user_id, job_id):
+    with _job_id_cache_lock:
+        _job_id_cache[user_id] = (job_id, time.monotonic() + JOB_ID_CACHE_TTL)
+        _job_id_cache.move_to_end(user_id)
+        while len(_job_id_cache) > JOB_ID_CACHE_MAX:
+            _job_id_cache.popitem(last=False)
+
+
+def _forget_job_id(user_id):
+    with _job_id_cache_lock:
+        _job_id_cache.pop(user_id, None)
+
+
+def _get_indexed_job_id(user_id):
+    """Return the job_id recorded for user_id in the job index (cached for a few seconds)"""
+    now = time.monotonic()
+    with _job_id_cache_lock:
+        entry = _job_id_cache.get(user_id)
+        if entry and entry[1] <= now:
+            del _job_id_cache[user_id]
+            entry = None
+    if entry:
+        return entry[0]
+
+    job_id = redis_conn.hget(USER_JOB_INDEX_KEY, user_id)
+    job_id = job_id.decode() if job_id else None
+    if job_id:
+        _remember_job_id(user_id, job_id)
+    return job_id
+
+
+def _find_job_for_user(user_id):
+    """Return the latest RQ job for user_id, or None if there is none"""
+    job_id = _get_indexed_job_id(user_id)
+    if job_id:
+        try:
+            return Job.fetch(job_id, connection=redis_conn)
+        except NoSuchJobError:
+            # Job expired from Redis, drop the stale index entry
+            redis_conn.hdel(USER_JOB_INDEX_KEY, user_id)
+            _forget_job_id(user_id)
+
+    # Fallback for jobs enqueued before the index existed
+    job_ids = (
+        queue.finished_job_registry.get_job_ids()
+        + queue.started_job_registry.get_job_ids()
+        + queue.get_job_ids()
+    )
+    if not job_ids:
+        return None
+
+    # Fetch every candidate job in a single pipelined round trip; expired
+    # jobs come back as None
+    jobs = Job.fetch_many(job_ids, connection=redis_conn, serializer=queue.serializer)
+    for job in jobs:
+        if job and job.meta and job.meta.get("user_id") == user_id:
+            redis_conn.hset(USER_JOB_INDEX_KEY, user_id, job.id)
+            _remember_job_id(user_id, job.id)
+            return job
+    return None
+
+
+# Buffer size for writing uploads to disk
+UPLOAD_BUFFER_SIZE = 1024 * 1024
+
+
+def _save_upload(file, path):
+    """Stream an uploaded file to disk in 1 MiB blocks (no fsync, the upload can be resent)"""
+    with open(path, 'wb', buffering=UPLOAD_BUFFER_SIZE) as out:
+        shutil.copyfileobj(file.stream, out, length=UPLOAD_BUFFER_SIZE)
+
+
+def _publish_initial_status(user_id, job_id, script_name):
+    """Publish the queued status of a new job (runs on _MQTT_EXECUTOR)"""
+    try:
+        mqtt_manager.publish_status_and_progress(
+            user_id,
+            "queued",
+            0,
+            f"Job {job_id} queued for script {script_name}. Waiting for worker to start processing..."
+        )
+        print(f"✓ Published initial MQTT status for user {user_id}, job {job_id}")
+    except Exception as e:
+        # Don't fail the request if MQTT publish fails
+        print(f"⚠️ Warning: Failed to publish initial MQTT status: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+def _publish_initial_statuses(entries):
+    """Publish the queued status for each (user_id, job_id, script_name) of a batch"""
+    for user_id, job_id, script_name in entries:
+        _publish_initial_status(user_id, job_id, script_name)
+
+
+def _fast_copy(src_path, dst_path):
+    """Copy file contents in-kernel with os.sendfile (metadata is not copied)"""
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        offset = 0
+        remaining = os.fstat(src.fileno()).st_size
+        try:
+            while remaining > 0:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, remaining)
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+        except (AttributeError, OSError):
+            # sendfile not available for these descriptors, finish with a buffered copy
+            src.seek(offset)
+            dst.seek(offset)
+            shutil.copyfileobj(src, dst)
 
 
 def _prepare_download_files(files, user_id):
@@ -104,42 +312,56 @@ def _prepare_download_files(files, user_id):
         return []
     
     # Always use default output directory (absolute path in container)
-    output_dir_absolute = os.path.join("/app", "outputs", "code", "cad_outputs_generated")
+    output_dir_absolute = "/app/outputs/code/cad_outputs_generated"
     os.makedirs(output_dir_absolute, exist_ok=True)
     
     # Relative path from source (workspace root)
     output_dir_relative = "outputs/code/cad_outputs_generated"
+    download_prefix = f"{_BASE_URL}/freecad/download/{user_id}/"
     
-    # Copy files to outputs directory and create download links
+    # Copy files to outputs directory concurrently and create download links
     download_links = []
+    copies = []
+    path_exists = os.path.exists
+    submit = _COPY_POOL.submit
     for f in files:
         src_path = f.get('path')
         filename = f.get('filename')
-        if src_path and os.path.exists(src_path):
-            dst_path_absolute = os.path.join(output_dir_absolute, filename)
-            dst_path_relative = os.path.join(output_dir_relative, filename)
-            shutil.copy2(src_path, dst_path_absolute)
+        if src_path and path_exists(src_path):
+            # Both directories are fixed POSIX paths, plain concatenation is enough
+            dst_path_relative = f"{output_dir_relative}/{filename}"
+            copies.append(submit(_fast_copy, src_path, f"{output_dir_absolute}/{filename}"))
             
             # Create download link
-            base_url = os.getenv('API_BASE_URL', f'http://{config.API_HOST}:{config.API_PORT}')
-            download_url = f"{base_url}/freecad/download/{user_id}/{filename}"
             download_links.append({
                 "type": f.get('type'),
                 "filename": filename,
-                "download_url": download_url,
+                "download_url": download_prefix + filename,
                 "local_path": dst_path_relative,  # Return relative path from source
                 "path": dst_path_relative  # Return relative path from source
             })
     
+    # Wait for every copy so the links are valid when returned (re-raises copy errors)
+    for copy in copies:
+        copy.result()
+    
     return download_links
 
 
-@api.route('/health')
-class Health(Resource):
-    @api.doc('health_check')
-    def get(self):
-        """Health check endpoint"""
-        return {"status": "ok", "time": iso_now()}
+# Pre-serialized /health body, rebuilt at most once per second
+_health_body = (0, b"")
+
+
+@app.route('/health')
+def health():
+    """Health check endpoint (plain Flask route, bypasses Flask-RESTX)"""
+    global _health_body
+    second = int(time.time())
+    cached_second, body = _health_body
+    if second != cached_second:
+        body = orjson.dumps({"status": "ok", "time": iso_now()})
+        _health_body = (second, body)
+    return app.response_class(body, mimetype='application/json')
 
 
 @freecad_ns.route('/generate')
@@ -169,7 +391,7 @@ class GenerateModel(Resource):
             
             # Save file in storage directory with user_id
             script_path = os.path.join(config.STORAGE_PATH, f"script_{user_id}_{file.filename}")
-            file.save(script_path)
+            _save_upload(file, script_path)
             
             # Put job into queue with user_id
             job = queue.enqueue(
@@ -179,31 +401,16 @@ class GenerateModel(Resource):
                 meta={"created_at": iso_now(), "script_name": file.filename, "user_id": user_id},
                 job_timeout=config.JOB_TIMEOUT
             )
+            redis_conn.hset(USER_JOB_INDEX_KEY, user_id, job.id)
+            _remember_job_id(user_id, job.id)
             
-            # Publish initial status to MQTT when job is queued
+            # Publish initial status to MQTT off the request thread
             mqtt_published = False
-            try:
-                if mqtt_manager.connected:
-                    mqtt_manager.publish_status(
-                        user_id,
-                        "queued",
-                        f"Job {job.id} queued for script {file.filename}"
-                    )
-                    mqtt_manager.publish_progress(
-                        user_id,
-                        0,
-                        "queued",
-                        f"Job queued. Waiting for worker to start processing..."
-                    )
-                    mqtt_published = True
-                    print(f"✓ Published initial MQTT status for user {user_id}, job {job.id}")
-                else:
-                    print(f"⚠️ MQTT not connected, cannot publish for user {user_id}")
-            except Exception as e:
-                print(f"⚠️ Warning: Failed to publish initial MQTT status: {e}")
-                import traceback
-                traceback.print_exc()
-                # Don't fail the request if MQTT publish fails
+            if mqtt_manager.connected:
+                _MQTT_EXECUTOR.submit(_publish_initial_status, user_id, job.id, file.filename)
+                mqtt_published = True
+            else:
+                print(f"⚠️ MQTT not connected, cannot publish for user {user_id}")
             
             # Always return immediately (no waiting) to avoid timeout for long-running jobs
             # Use /freecad/status/{user_id} to check progress via MQTT in real-time
@@ -223,75 +430,126 @@ class GenerateModel(Resource):
             api.abort(500, f"Failed to process file: {exc}")
 
 
+@freecad_ns.route('/generate/batch')
+class GenerateModelBatch(Resource):
+    @api.expect(batch_upload_parser)
+    @api.doc('generate_model_batch')
+    def post(self):
+        """Create FreeCAD models from several script files in one request"""
+        files = request.files.getlist('files')
+        user_ids = request.form.getlist('user_id')
+        if not files:
+            api.abort(400, "No files uploaded")
+        if len(user_ids) != len(files):
+            api.abort(400, "Provide exactly one user_id per file")
+        for file, user_id in zip(files, user_ids):
+            if not user_id:
+                api.abort(400, "user_id is required")
+            if file.filename == '' or not file.filename.endswith('.py'):
+                api.abort(400, f"File must be a Python script (.py): {file.filename}")
+        
+        try:
+            # Save all scripts concurrently
+            script_paths = [
+                os.path.join(config.STORAGE_PATH, f"script_{user_id}_{file.filename}")
+                for file, user_id in zip(files, user_ids)
+            ]
+            saves = [_COPY_POOL.submit(_save_upload, file, path) for file, path in zip(files, script_paths)]
+            for save in saves:
+                save.result()
+            
+            # Enqueue every job in a single Redis pipeline
+            created_at = iso_now()
+            job_datas = [
+                Queue.prepare_data(
+                    "worker.execute_freecad_script",
+                    args=(script_path,),
+                    kwargs={"user_id": user_id},
+                    timeout=config.JOB_TIMEOUT,
+                    meta={"created_at": created_at, "script_name": file.filename, "user_id": user_id},
+                )
+                for file, user_id, script_path in zip(files, user_ids, script_paths)
+            ]
+            jobs = queue.enqueue_many(job_datas)
+            
+            redis_conn.hset(USER_JOB_INDEX_KEY, mapping={user_id: job.id for user_id, job in zip(user_ids, jobs)})
+            for user_id, job in zip(user_ids, jobs):
+                _remember_job_id(user_id, job.id)
+            
+            # Publish all initial statuses with one background task
+            mqtt_published = False
+            if mqtt_manager.connected:
+                _MQTT_EXECUTOR.submit(
+                    _publish_initial_statuses,
+                    [(user_id, job.id, file.filename) for file, user_id, job in zip(files, user_ids, jobs)],
+                )
+                mqtt_published = True
+            
+            return {
+                "status": "queued",
+                "message": f"{len(jobs)} scripts have been queued for processing.",
+                "created_at": created_at,
+                "jobs": [
+                    {
+                        "user_id": user_id,
+                        "job_id": job.id,
+                        "script_name": file.filename,
+                        "check_status_url": f"/freecad/status/{user_id}",
+                        "check_result_url": f"/freecad/result/{user_id}",
+                    }
+                    for file, user_id, job in zip(files, user_ids, jobs)
+                ],
+                "mqtt_published": mqtt_published
+            }
+            
+        except Exception as exc:
+            api.abort(500, f"Failed to process files: {exc}")
+
+
 @freecad_ns.route('/status/<string:user_id>')
 class JobStatus(Resource):
-    @api.marshal_with(status_response)
+    # Polled constantly: documented with status_response but serialized
+    # directly with orjson instead of going through marshal_with
+    @api.response(200, 'Success', status_response)
     @api.doc('get_job_status')
     def get(self, user_id):
         """Check job status by user_id with progress from MQTT"""
         try:
             # Check MQTT progress first
             mqtt_progress = mqtt_manager.get_progress(user_id)
-            mqtt_connected = mqtt_manager.connected if hasattr(mqtt_manager, 'connected') else False
+            mqtt_connected = mqtt_manager.connected
             
             if mqtt_progress:
-                # Try to find the job in RQ to get job_id if not present in MQTT meta
+                # job_id is optional here: read it from the job index only,
+                # never fall back to scanning the RQ registries
                 job_id = None
                 try:
-                    def _find_job_for_user():
-                        registries = [
-                            queue.finished_job_registry.get_job_ids(),
-                            queue.started_job_registry.get_job_ids(),
-                            queue.get_job_ids(),
-                        ]
-                        for job_ids in registries:
-                            for jid in job_ids:
-                                try:
-                                    j = Job.fetch(jid, connection=redis_conn)
-                                    if j.meta and j.meta.get("user_id") == user_id:
-                                        return j
-                                except Exception:
-                                    continue
-                        return None
-                    job = _find_job_for_user()
-                    if job:
-                        job_id = job.id
+                    job_id = _get_indexed_job_id(user_id)
                 except Exception:
                     pass
                 
-                return {
+                response = {
                     "user_id": user_id,
-                    "job_id": job_id,
-                    "status": mqtt_progress.get("status", "unknown"),
-                    "progress": mqtt_progress.get("progress", 0),
+                    "status": mqtt_progress.get("status") or "unknown",
+                    "progress": int(mqtt_progress.get("progress") or 0),
                     "message": mqtt_progress.get("message", ""),
-                    "error": mqtt_progress.get("error"),
-                    "updated_at": mqtt_progress.get("updated_at", iso_now()),
+                    "updated_at": mqtt_progress.get("updated_at") or iso_now(),
                     "data_source": "mqtt",
                     "mqtt_connected": mqtt_connected
                 }
+                # Only include optional fields that are set (None is skipped anyway)
+                if job_id:
+                    response["job_id"] = job_id
+                if mqtt_progress.get("error"):
+                    response["error"] = str(mqtt_progress["error"])
+                return _json_response(response)
             
-            def _find_job_for_user():
-                registries = [
-                    queue.finished_job_registry.get_job_ids(),
-                    queue.started_job_registry.get_job_ids(),
-                    queue.get_job_ids(),
-                ]
-                for job_ids in registries:
-                    for job_id in job_ids:
-                        try:
-                            job = Job.fetch(job_id, connection=redis_conn)
-                        except Exception:
-                            continue
-                        if job.meta and job.meta.get("user_id") == user_id:
-                            return job
-                return None
-
             # Fallback to Redis if no MQTT data
-            job = _find_job_for_user()
+            job = _find_job_for_user(user_id)
             
             if job:
-                status = job.get_status()
+                # Status was loaded with the job hash, no extra HGET needed
+                status = job.get_status(refresh=False)
                 updated_at = iso_now()
                 if job.ended_at:
                     updated_at = job.ended_at.replace(tzinfo=timezone.utc).isoformat()
@@ -300,17 +558,16 @@ class JobStatus(Resource):
                     progress = 50
                 elif status == "finished":
                     progress = 100
-                return {
+                return _json_response({
                     "user_id": user_id,
                     "job_id": job.id,
                     "status": status,
                     "progress": progress,
                     "message": f"Job {status} (from Redis queue)",
-                    "error": None,
                     "updated_at": updated_at,
                     "data_source": "redis",
                     "mqtt_connected": mqtt_connected
-                }
+                })
             
             api.abort(
                 404,
@@ -332,7 +589,7 @@ class JobStatus(Resource):
 @freecad_ns.route('/result/<string:user_id>')
 class JobResult(Resource):
     @api.expect(result_parser)
-    @api.marshal_with(result_response)
+    @api.marshal_with(result_response, skip_none=True)
     @api.doc('get_job_result')
     def get(self, user_id):
         """Get job result by user_id. Use auto_download=true to copy files to outputs/code/cad_outputs_generated/ and get download links."""
@@ -342,7 +599,7 @@ class JobResult(Resource):
             auto_download = str(auto_download_raw).lower() in ['1', 'true', 'yes', 'on']
             
             # Helper function to return result
-            def _return_result(job, files):
+            def _return_result(job_id, files, completed_at):
                 if auto_download and files:
                     # Copy files to outputs directory and create download links
                     download_links = _prepare_download_files(files, user_id)
@@ -352,95 +609,50 @@ class JobResult(Resource):
                     
                     return {
                         "user_id": user_id,
-                        "job_id": job.id if job else None,
+                        "job_id": job_id,
                         "status": "success",
                         "message": f"Files generated and saved to {output_dir}/",
                         "files": download_links,
                         "output_directory": output_dir,
-                        "completed_at": job.ended_at.replace(tzinfo=timezone.utc).isoformat()
-                        if job and job.ended_at
-                        else iso_now(),
+                        "completed_at": completed_at,
                     }
                 else:
                     return {
                         "user_id": user_id,
-                        "job_id": job.id if job else None,
+                        "job_id": job_id,
                         "status": "success",
                         "files": files,
-                        "completed_at": job.ended_at.replace(tzinfo=timezone.utc).isoformat()
-                        if job and job.ended_at
-                        else iso_now(),
+                        "completed_at": completed_at,
                     }
             
-            # Find job by user_id in meta
-            # Try to find in finished jobs first
-            finished_jobs = queue.finished_job_registry.get_job_ids()
-            for job_id in finished_jobs:
-                try:
-                    job = Job.fetch(job_id, connection=redis_conn)
-                    if job.meta and job.meta.get('user_id') == user_id:
-                        status = job.get_status()
-                        if status != "finished":
-                            return {
-                                "user_id": user_id,
-                                "job_id": job.id,
-                                "status": status,
-                                "message": "Result not ready yet. Job is still running.",
-                                "files": [],
-                                "completed_at": None,
-                            }, 202
-
-                        result = job.result or {}
-                        files = result.get("files", [])
-                        return _return_result(job, files)
-                except:
-                    continue
-            
-            # Find in running jobs
-            started_jobs = queue.started_job_registry.get_job_ids()
-            for job_id in started_jobs:
-                try:
-                    job = Job.fetch(job_id, connection=redis_conn)
-                    if job.meta and job.meta.get('user_id') == user_id:
-                        status = job.get_status()
-                        if status != "finished":
-                            return {
-                                "user_id": user_id,
-                                "job_id": job.id,
-                                "status": status,
-                                "message": "Result not ready yet. Job is still running.",
-                                "files": [],
-                                "completed_at": None,
-                            }, 202
-
-                        result = job.result or {}
-                        files = result.get("files", [])
-                        return _return_result(job, files)
-                except:
-                    continue
+            # Result pushed by the worker over MQTT, valid if it belongs to the
+            # user's latest job
+            mqtt_result = mqtt_manager.get_result(user_id)
+            if mqtt_result and mqtt_result.get("job_id") == _get_indexed_job_id(user_id):
+                return _return_result(
+                    mqtt_result["job_id"],
+                    mqtt_result.get("files", []),
+                    mqtt_result.get("completed_at") or iso_now(),
+                )
             
-            # Find in queue
-            queued_jobs = queue.get_job_ids()
-            for job_id in queued_jobs:
-                try:
-                    job = Job.fetch(job_id, connection=redis_conn)
-                    if job.meta and job.meta.get('user_id') == user_id:
-                        status = job.get_status()
-                        if status != "finished":
-                            return {
-                                "user_id": user_id,
-                                "job_id": job.id,
-                                "status": status,
-                                "message": "Result not ready yet. Job is still running.",
-                                "files": [],
-                                "completed_at": None,
-                            }, 202
-
-                        result = job.result or {}
-                        files = result.get("files", [])
-                        return _return_result(job, files)
-                except:
-                    continue
+            # Find job by user_id through the job index
+            job = _find_job_for_user(user_id)
+            if job:
+                # Status was loaded with the job hash, no extra HGET needed
+                status = job.get_status(refresh=False)
+                if status != "finished":
+                    return {
+                        "user_id": user_id,
+                        "job_id": job.id,
+                        "status": status,
+                        "message": "Result not ready yet. Job is still running.",
+                        "files": [],
+                    }, 202
+
+                result = job.result or {}
+                files = result.get("files", [])
+                completed_at = job.ended_at.replace(tzinfo=timezone.utc).isoformat() if job.ended_at else iso_now()
+                return _return_result(job.id, files, completed_at)
             
             api.abort(
                 404,
@@ -465,30 +677,33 @@ class DownloadFile(Resource):
     def get(self, user_id, filename):
         """Download file by user_id and filename"""
         try:
-            # Check in default outputs directory first (for auto_download files)
-            output_dir = os.path.join("/app", "outputs", "code", "cad_outputs_generated")
-            file_path = os.path.join(output_dir, filename)
-            
-            # If not found, search in all subdirectories of /app/outputs/
-            if not os.path.exists(file_path):
-                outputs_base = "/app/outputs"
-                if os.path.exists(outputs_base):
-                    for root, dirs, files in os.walk(outputs_base):
-                        if filename in files:
-                            file_path = os.path.join(root, filename)
-                            break
+            # Auto-download copies live in the default outputs directory, worker
+            # results in the storage directory; check them in that order
+            candidates = [
+                os.path.join("/app", "outputs", "code", "cad_outputs_generated", filename),
+                os.path.join(config.STORAGE_PATH, filename),
+            ]
+            file_path = next((path for path in candidates if os.path.isfile(path)), None)
             
-            # If still not found, check in storage directory
-            if not os.path.exists(file_path):
-                file_path = os.path.join(config.STORAGE_PATH, filename)
-            
-            if not os.path.exists(file_path):
+            if file_path is None:
                 api.abort(404, f"File not found: {filename}")
             
             # Check if file belongs to this user (filename contains user_id)
             if user_id not in filename:
                 api.abort(403, f"Access denied: File does not belong to user {user_id}")
             
+            # Let nginx stream the file from its internal location
+            if config.DOWNLOAD_OFFLOAD == "x-accel":
+                internal_uri = x_accel_redirect_uri(file_path, config.X_ACCEL_ROOT, config.X_ACCEL_PREFIX)
+                if internal_uri:
+                    headers = _attachment_headers(filename)
+                    headers["X-Accel-Redirect"] = internal_uri
+                    return Response(
+                        status=200,
+                        mimetype='application/octet-stream',
+                        headers=headers,
+                    )
+            
             # Return file
             return send_file(
                 file_path,
@@ -530,4 +745,5 @@ class AllWorkersStatus(Resource):
 
 
 if __name__ == "__main__":
-    app.run(host=config.API_HOST, port=config.API_PORT, debug=True)
+    # threaded: each polling client gets its own thread instead of queueing behind others
+    app.run(host=config.API_HOST, port=config.API_PORT, debug=config.API_DEBUG, threaded=True)
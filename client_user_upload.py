@@ -4,18 +4,78 @@ FreeCAD API Client - User-based Script Processor
 Equivalent to: freecadcmd <script.py> with user management
 """
 
+import atexit
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import sys
 import os
+import shutil
 import tarfile
 
 API_BASE_URL = os.getenv('API_BASE_URL', 'http://localhost:8000')
 
+# (connect, read) timeouts for API calls and file downloads
+REQUEST_TIMEOUT = (5, 60)
+DOWNLOAD_TIMEOUT = (5, 300)
+
+# Downloads are streamed to disk in blocks of this size
+DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Result files downloaded in parallel by upload_script and main
+MAX_DOWNLOAD_WORKERS = 8
+
+# wait_for_completion polls with exponential backoff between these delays (seconds)
+STATUS_POLL_INITIAL_DELAY = 0.25
+STATUS_POLL_MAX_DELAY = 5.0
+
+# Shared session: keeps the connection to the API alive across the health
+# check, upload, status polls and file downloads. Idempotent requests are
+# retried on gateway errors; POST uploads are never retried.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+atexit.register(SESSION.close)
+
+def _stream_to_file(response, file_path):
+    """Copy a streamed response body to file_path in DOWNLOAD_CHUNK_SIZE blocks"""
+    # Let urllib3 undo any Content-Encoding while reading the raw stream
+    response.raw.decode_content = True
+    with open(file_path, 'wb') as f:
+        shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+
+def _download_one(file_info, output_dir):
+    """Download one result file into output_dir, returning its path or None on failure"""
+    file_type = file_info.get('type', '').upper()
+    filename = file_info.get('filename', '')
+    download_url = file_info.get('download_url', '')
+    
+    print(f"📥 Downloading {file_type}: {filename}")
+    
+    try:
+        with SESSION.get(download_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as file_response:
+            if file_response.status_code == 200:
+                file_path = os.path.join(output_dir, filename)
+                _stream_to_file(file_response, file_path)
+                
+                print(f"✅ Downloaded: {file_path}")
+                return file_path
+            print(f"❌ Download failed: {file_response.status_code}")
+    except Exception as e:
+        print(f"❌ Download error: {e}")
+    return None
+
 def check_health():
     """Check API health"""
     try:
-        response = requests.get(f"{API_BASE_URL}/health")
+        response = SESSION.get(f"{API_BASE_URL}/health", timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
             print(f"✅ API Health: {response.json()['status']} at {response.json()['time']}")
             return True
@@ -43,7 +103,7 @@ def upload_script(script_file, user_id, auto_download=False):
             if auto_download:
                 print(f"🔄 Auto-download enabled - will wait for completion and download files")
             
-            response = requests.post(f"{API_BASE_URL}/freecad/generate", files=files, data=data)
+            response = SESSION.post(f"{API_BASE_URL}/freecad/generate", files=files, data=data, timeout=REQUEST_TIMEOUT)
             
             if response.status_code == 200:
                 content_type = response.headers.get('content-type', '')
@@ -54,31 +114,21 @@ def upload_script(script_file, user_id, auto_download=False):
                         print(f"✅ Job completed for user: {result['user_id']}")
                         print(f"📁 Files saved to: {result.get('output_directory', 'N/A')}")
                         
+                        output_dir = "outputs/code/cad_outputs_generated"
+                        os.makedirs(output_dir, exist_ok=True)
+                        
+                        # Download all files concurrently over the shared session
                         downloaded_files = []
-                        for file_info in result['files']:
-                            file_type = file_info.get('type', '').upper()
-                            filename = file_info.get('filename', '')
-                            download_url = file_info.get('download_url', '')
-                            local_path = file_info.get('local_path', '')
-                            
-                            print(f"📥 Downloading {file_type}: {filename}")
-                            
-                            try:
-                                file_response = requests.get(download_url)
-                                if file_response.status_code == 200:
-                                    output_dir = "outputs/code/cad_outputs_generated"
-                                    os.makedirs(output_dir, exist_ok=True)
-                                    file_path = os.path.join(output_dir, filename)
-                                    
-                                    with open(file_path, 'wb') as f:
-                                        f.write(file_response.content)
-                                    
-                                    print(f"✅ Downloaded: {file_path}")
+                        max_workers = min(MAX_DOWNLOAD_WORKERS, len(result['files']))
+                        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                            futures = [
+                                executor.submit(_download_one, file_info, output_dir)
+                                for file_info in result['files']
+                            ]
+                            for future in as_completed(futures):
+                                file_path = future.result()
+                                if file_path:
                                     downloaded_files.append(file_path)
-                                else:
-                                    print(f"❌ Download failed: {file_response.status_code}")
-                            except Exception as e:
-                                print(f"❌ Download error: {e}")
                         
                         if downloaded_files:
                             print(f"\n📁 All files saved to: outputs/code/cad_outputs_generated/")
@@ -106,7 +156,7 @@ def upload_script(script_file, user_id, auto_download=False):
 def check_status(user_id):
     """Check job status"""
     try:
-        response = requests.get(f"{API_BASE_URL}/freecad/status/{user_id}")
+        response = SESSION.get(f"{API_BASE_URL}/freecad/status/{user_id}", timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
             return response.json()['status']
         elif response.status_code == 202:
@@ -121,7 +171,7 @@ def check_status(user_id):
 def get_result(user_id):
     """Get job result"""
     try:
-        response = requests.get(f"{API_BASE_URL}/freecad/result/{user_id}")
+        response = SESSION.get(f"{API_BASE_URL}/freecad/result/{user_id}", timeout=REQUEST_TIMEOUT)
         if response.status_code == 200:
             return response.json()
         elif response.status_code == 202:
@@ -142,16 +192,14 @@ def download_file(user_id, filename, local_path=None):
             local_path = filename
         
         print(f"📥 Downloading {filename}...")
-        response = requests.get(f"{API_BASE_URL}/freecad/download/{user_id}/{filename}")
-        
-        if response.status_code == 200:
-            with open(local_path, 'wb') as f:
-                f.write(response.content)
-            print(f"✅ Downloaded: {local_path}")
-            return True
-        else:
-            print(f"❌ Download failed: {response.status_code} - {response.text}")
-            return False
+        with SESSION.get(f"{API_BASE_URL}/freecad/download/{user_id}/{filename}", stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code == 200:
+                _stream_to_file(response, local_path)
+                print(f"✅ Downloaded: {local_path}")
+                return True
+            else:
+                print(f"❌ Download failed: {response.status_code} - {response.text}")
+                return False
     except Exception as e:
         print(f"❌ Download error: {e}")
         return False
@@ -160,6 +208,8 @@ def wait_for_completion(user_id, max_wait=60):
     """Wait for job to complete"""
     print(f"⏳ Waiting for job {user_id} to complete...")
     start_time = time.time()
+    # Poll quickly at first so short jobs are noticed early, then back off
+    delay = STATUS_POLL_INITIAL_DELAY
     while time.time() - start_time < max_wait:
         status = check_status(user_id)
         if status == 'finished':
@@ -172,7 +222,8 @@ def wait_for_completion(user_id, max_wait=60):
             # Error already printed by check_status
             return None
         print(f"📊 Status: {status}")
-        time.sleep(2)
+        time.sleep(delay)
+        delay = min(STATUS_POLL_MAX_DELAY, delay * 1.5)
     
     print(f"⏰ Timeout after {max_wait} seconds")
     return None
@@ -220,16 +271,20 @@ def main():
         print("\n🎉 Job completed successfully!")
         print(f"📁 Files generated:")
         
-        downloaded_files = []
         for file_info in result['files']:
             file_type = file_info['type'].upper()
             filename = file_info['filename']
             path = file_info['path']
             print(f"   📄 {file_type}: {filename}")
             print(f"      Path: {path}")
-            
-            if download_file(uploaded_user_id, filename):
-                downloaded_files.append(filename)
+        
+        # Download all files concurrently over the shared session
+        filenames = [file_info['filename'] for file_info in result['files']]
+        downloaded_files = []
+        if filenames:
+            with ThreadPoolExecutor(max_workers=min(MAX_DOWNLOAD_WORKERS, len(filenames))) as executor:
+                results = executor.map(lambda filename: download_file(uploaded_user_id, filename), filenames)
+                downloaded_files = [filename for filename, ok in zip(filenames, results) if ok]
         
         print(f"\n⏰ Completed at: {result['completed_at']}")
         
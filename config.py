@@ -1,5 +1,4 @@
 import os
-from datetime import timedelta
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -10,14 +9,24 @@ load_dotenv()
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 QUEUE_NAME = os.getenv("QUEUE_NAME", "freecad_jobs")
 STORAGE_PATH = os.getenv("STORAGE_PATH", "/app/storage")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", "5"))  # Seconds to wait for a free pooled connection
+REDIS_SOCKET_TIMEOUT = int(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
 
 # API Configuration
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8080"))  # Changed default to 8020
+API_DEBUG = os.getenv("API_DEBUG", "false").lower() in ("1", "true", "yes", "on")  # Flask debugger + reloader, development only
 MQTT_BROKER = os.getenv("MQTT_BROKER", "mqtt://localhost:1883")  # Default to localhost
 
-JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", str(int(timedelta(hours=1).total_seconds()))))  # Default 1 hour for heavy files
-RESULT_TTL = int(os.getenv("RESULT_TTL", str(int(timedelta(hours=12).total_seconds()))))
-FAILURE_TTL = int(os.getenv("FAILURE_TTL", str(int(timedelta(hours=12).total_seconds()))))
+# Download offloading to a front-end web server: "" (Flask streams the file),
+# "x-sendfile" (Apache/lighttpd) or "x-accel" (nginx internal location)
+DOWNLOAD_OFFLOAD = os.getenv("DOWNLOAD_OFFLOAD", "").lower()
+X_ACCEL_ROOT = os.getenv("X_ACCEL_ROOT", "/app")  # Directory the nginx internal location aliases
+X_ACCEL_PREFIX = os.getenv("X_ACCEL_PREFIX", "/internal/")
+
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "3600"))  # Default 1 hour for heavy files
+RESULT_TTL = int(os.getenv("RESULT_TTL", "43200"))  # 12 hours
+FAILURE_TTL = int(os.getenv("FAILURE_TTL", "43200"))  # 12 hours
 
 os.makedirs(STORAGE_PATH, exist_ok=True)
@@ -0,0 +1,23 @@
+"""
+Helpers for handing file downloads off to the front-end web server
+"""
+
+import os
+from typing import Optional
+from urllib.parse import quote
+
+
+def x_accel_redirect_uri(file_path: str, accel_root: str, prefix: str) -> Optional[str]:
+    """
+    Internal nginx URI for file_path, or None when it lies outside accel_root.
+
+    The path is percent-encoded: nginx decodes the X-Accel-Redirect value, so
+    a literal "?", "%" or "#" would otherwise be read as a query or an escape,
+    and non-latin-1 names could not be sent as a header at all.
+    """
+    real_path = os.path.realpath(file_path)
+    root = os.path.realpath(accel_root)
+    if not real_path.startswith(root + os.sep):
+        return None
+    relative = os.path.relpath(real_path, root).replace(os.sep, "/")
+    return prefix.rstrip("/") + "/" + quote(relative)
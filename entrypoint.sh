@@ -17,6 +17,7 @@ export NUM_WORKERS=${NUM_WORKERS:-3}
 
 worker_pids=()
 api_pid=""
+daemon_pid=""
 
 cleanup() {
     exit_code=${1:-0}
@@ -24,6 +25,9 @@ cleanup() {
     if [ -n "$redis_pid" ]; then
         kill -TERM "$redis_pid" 2>/dev/null || true
     fi
+    if [ -n "$daemon_pid" ]; then
+        kill -TERM "$daemon_pid" 2>/dev/null || true
+    fi
     for pid in "${worker_pids[@]}"; do
         kill -TERM "$pid" 2>/dev/null || true
     done
@@ -48,6 +52,14 @@ fi
 # Note: MQTT broker runs in separate container
 echo "📡 MQTT broker: ${MQTT_BROKER} (external container)"
 
+# Optional persistent FreeCAD daemon: workers fork jobs from it instead of starting freecadcmd
+if [ -n "${FREECAD_DAEMON_SOCKET}" ]; then
+    echo "🧩 Starting FreeCAD daemon on ${FREECAD_DAEMON_SOCKET}..."
+    conda run -n base --no-capture-output env PYTHONPATH=/app:/app/src/core freecadcmd /app/src/core/freecad_daemon.py &
+    daemon_pid=$!
+    sleep 2
+fi
+
 # Start RQ workers (using conda base environment where FreeCAD is installed)
 echo "👥 Starting ${NUM_WORKERS} worker(s)..."
 worker_pids=()
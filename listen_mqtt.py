@@ -6,13 +6,14 @@ Sử dụng: python listen_mqtt.py [user_id]
 - Nếu có user_id: chỉ lắng nghe user đó
 """
 
-import json
+import orjson
 import sys
 import time
 import paho.mqtt.client as mqtt
 from datetime import datetime
 import os
 import config
+from mqtt_client import parse_mqtt_broker
 
 # Màu sắc cho output
 class Colors:
@@ -24,6 +25,28 @@ class Colors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
 
+# Template output cho mỗi message (dựng sẵn một lần)
+MSG_TMPL = (
+    f"\n{Colors.BOLD}{'='*80}{Colors.RESET}\n"
+    f"{Colors.BLUE}Topic:{Colors.RESET} {{topic}}\n"
+    f"{Colors.BLUE}User ID:{Colors.RESET} {Colors.BOLD}{{user_id}}{Colors.RESET}\n"
+    f"{Colors.BLUE}Timestamp:{Colors.RESET} {{timestamp}}\n"
+    f"{Colors.BLUE}Status:{Colors.RESET} {Colors.BOLD}{{status}}{Colors.RESET}\n"
+    f"{Colors.BLUE}Progress:{Colors.RESET} {Colors.BOLD}{{progress}}%{Colors.RESET}\n"
+)
+MESSAGE_TMPL = f"{Colors.BLUE}Message:{Colors.RESET} {{message}}\n"
+ERROR_TMPL = f"{Colors.RED}Error:{Colors.RESET} {{error}}\n"
+BAR_TMPL = f"{Colors.CYAN}Progress Bar:{Colors.RESET} [{{bar}}] {{progress}}%\n"
+RAW_TMPL = f"\n{Colors.YELLOW}Raw JSON:{Colors.RESET}\n{{raw}}\n"
+
+# Progress bar dựng sẵn, mỗi message chỉ cắt lát
+BAR_LENGTH = 50
+BAR_FULL = '█' * BAR_LENGTH
+BAR_EMPTY = '░' * BAR_LENGTH
+
+# Đặt DEBUG_MQTT=1 để in thêm raw JSON của mỗi message
+DEBUG_MQTT = os.getenv("DEBUG_MQTT", "0").lower() in ("1", "true", "yes", "on")
+
 def format_timestamp(timestamp_str):
     """Format timestamp để dễ đọc"""
     try:
@@ -32,9 +55,9 @@ def format_timestamp(timestamp_str):
     except:
         return timestamp_str
 
-def on_connect(client, userdata, flags, rc):
+def on_connect(client, userdata, flags, reason_code, properties):
     """Callback khi kết nối MQTT"""
-    if rc == 0:
+    if not reason_code.is_failure:
         print(f"{Colors.GREEN}✓ MQTT Connected successfully!{Colors.RESET}")
         if userdata.get('user_id'):
             # Subscribe cho user cụ thể
@@ -47,43 +70,44 @@ def on_connect(client, userdata, flags, rc):
             client.subscribe("freecad/status/+")
             print(f"{Colors.CYAN}Listening to all users: freecad/progress/+ and freecad/status/+{Colors.RESET}")
     else:
-        print(f"{Colors.RED}✗ MQTT Connection failed with code {rc}{Colors.RESET}")
+        print(f"{Colors.RED}✗ MQTT Connection failed with code {reason_code}{Colors.RESET}")
 
 def on_message(client, userdata, msg):
     """Callback khi nhận được message"""
     try:
-        topic_parts = msg.topic.split("/")
-        user_id = topic_parts[-1] if len(topic_parts) >= 3 else "unknown"
+        _, sep, user_id = msg.topic.rpartition("/")
+        if not sep:
+            user_id = "unknown"
         
         # Parse JSON message
-        message_data = json.loads(msg.payload.decode())
+        message_data = orjson.loads(msg.payload)
         
-        # Hiển thị thông tin
-        print(f"\n{Colors.BOLD}{'='*80}{Colors.RESET}")
-        print(f"{Colors.BLUE}Topic:{Colors.RESET} {msg.topic}")
-        print(f"{Colors.BLUE}User ID:{Colors.RESET} {Colors.BOLD}{user_id}{Colors.RESET}")
-        print(f"{Colors.BLUE}Timestamp:{Colors.RESET} {format_timestamp(message_data.get('timestamp', ''))}")
-        print(f"{Colors.BLUE}Status:{Colors.RESET} {Colors.BOLD}{message_data.get('status', 'N/A')}{Colors.RESET}")
-        print(f"{Colors.BLUE}Progress:{Colors.RESET} {Colors.BOLD}{message_data.get('progress', 0)}%{Colors.RESET}")
+        # Hiển thị thông tin: ghép toàn bộ output rồi ghi một lần
+        progress = message_data.get('progress', 0)
+        filled = min(max(int(BAR_LENGTH * progress) // 100, 0), BAR_LENGTH)
+        bar = BAR_FULL[:filled] + BAR_EMPTY[filled:]
         
+        parts = [MSG_TMPL.format(
+            topic=msg.topic,
+            user_id=user_id,
+            timestamp=format_timestamp(message_data.get('timestamp', '')),
+            status=message_data.get('status', 'N/A'),
+            progress=progress,
+        )]
         if message_data.get('message'):
-            print(f"{Colors.BLUE}Message:{Colors.RESET} {message_data['message']}")
-        
+            parts.append(MESSAGE_TMPL.format(message=message_data['message']))
         if message_data.get('error'):
-            print(f"{Colors.RED}Error:{Colors.RESET} {message_data['error']}")
+            parts.append(ERROR_TMPL.format(error=message_data['error']))
+        parts.append(BAR_TMPL.format(bar=bar, progress=progress))
         
-        # Hiển thị progress bar
-        progress = message_data.get('progress', 0)
-        bar_length = 50
-        filled = int(bar_length * progress / 100)
-        bar = '█' * filled + '░' * (bar_length - filled)
-        print(f"{Colors.CYAN}Progress Bar:{Colors.RESET} [{bar}] {progress}%")
+        # Raw JSON chỉ hiển thị khi DEBUG_MQTT=1
+        if DEBUG_MQTT:
+            parts.append(RAW_TMPL.format(raw=orjson.dumps(message_data, option=orjson.OPT_INDENT_2).decode()))
         
-        # Hiển thị raw JSON (có thể comment nếu không cần)
-        print(f"\n{Colors.YELLOW}Raw JSON:{Colors.RESET}")
-        print(json.dumps(message_data, indent=2, ensure_ascii=False))
+        sys.stdout.write(''.join(parts))
+        sys.stdout.flush()
         
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         print(f"{Colors.RED}Error parsing JSON: {e}{Colors.RESET}")
         print(f"Raw message: {msg.payload.decode()}")
     except Exception as e:
@@ -101,19 +125,22 @@ def main():
     
     # Get MQTT broker config
     broker_url = os.getenv("MQTT_BROKER", config.MQTT_BROKER)
-    broker_host = broker_url.replace("mqtt://", "").split(":")[0]
-    broker_port = int(broker_url.split(":")[-1]) if ":" in broker_url else 1883
+    broker_host, broker_port = parse_mqtt_broker(broker_url)
     
     print(f"{Colors.YELLOW}Connecting to MQTT broker: {broker_host}:{broker_port}{Colors.RESET}")
     
     # Create MQTT client
-    client = mqtt.Client(userdata={'user_id': user_id})
+    client = mqtt.Client(
+        callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+        protocol=mqtt.MQTTv5,
+        userdata={'user_id': user_id},
+    )
     client.on_connect = on_connect
     client.on_message = on_message
     
     try:
         # Connect to broker
-        client.connect(broker_host, broker_port, 60)
+        client.connect(broker_host, broker_port, 60, clean_start=True)
         
         # Start loop
         print(f"{Colors.GREEN}Starting MQTT listener... (Press Ctrl+C to stop){Colors.RESET}\n")
@@ -5,18 +5,36 @@ Provides real-time progress tracking via MQTT messages
 
 from typing import Dict, Any, Optional
 import paho.mqtt.client as mqtt
+from paho.mqtt.packettypes import PacketTypes
+from paho.mqtt.properties import Properties
 from datetime import datetime, timezone
+import atexit
+import functools
 import os
 import socket
 import subprocess
-import json
+import orjson
 import threading
 import time
+from collections import deque
+from urllib.parse import urlparse
 import config
 
 
+@functools.lru_cache(maxsize=8)
+def parse_mqtt_broker(url: str):
+    """Split a broker URL such as mqtt://host:1883 (scheme optional, IPv6 as [::1]) into (host, port)"""
+    parsed = urlparse(url if "://" in url else f"mqtt://{url}")
+    return parsed.hostname or "localhost", parsed.port or 1883
+
+
+@functools.lru_cache(maxsize=1)
 def _get_host_ip():
-    """Get host machine IP from container (gateway IP)"""
+    """Get host machine IP from container (gateway IP), or None outside a container"""
+    # localhost already points at the host when not containerized
+    if not os.path.exists('/.dockerenv') and not os.environ.get('KUBERNETES_SERVICE_HOST'):
+        return None
+    
     try:
         # Try to get gateway IP from default route
         result = subprocess.run(
@@ -33,10 +51,9 @@ def _get_host_ip():
     
     try:
         # Fallback: try to connect to host.docker.internal (Docker Desktop)
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        host_ip = s.getsockname()[0]
-        s.close()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            host_ip = s.getsockname()[0]
         # If we're in a container, get gateway
         result = subprocess.run(
             ['ip', 'route', 'get', '8.8.8.8'],
@@ -63,15 +80,46 @@ def _get_host_ip():
     return None
 
 
+# Fields of a progress message copied into the per-user progress entry
+PROGRESS_FIELDS = ("progress", "status", "message", "error")
+
+# Starting values of a user's progress entry
+DEFAULT_PROGRESS = {
+    "status": "unknown",
+    "progress": 0,
+    "message": "",
+    "updated_at": None,
+    "error": None
+}
+
+# Statuses that end a job; their updates are always published
+TERMINAL_STATUSES = ("finished", "failed")
+
+# Seconds an intermediate progress update stays deliverable on the broker
+PROGRESS_EXPIRY = 60
+
+# Intermediate progress updates are dropped while more progress publishes
+# than this have not been written to the socket yet
+MAX_PENDING_PUBLISHES = 256
+
+# Publish timestamps are reused for this many seconds
+TIMESTAMP_RESOLUTION = 0.1
+
+# Minimum seconds between throttled progress updates of one user
+PROGRESS_MIN_INTERVAL = 1.0
+
+
 class MQTTProgressManager:
     """
     MQTT client to manage progress updates from workers
     """
     
-    def __init__(self, broker_url: str = None):
+    def __init__(self, broker_url: str = None, subscribe: bool = True):
         self.broker_url = broker_url or config.MQTT_BROKER
-        broker_host_raw = self.broker_url.replace("mqtt://", "").split(":")[0]
-        self.broker_port = int(self.broker_url.split(":")[-1]) if ":" in self.broker_url else 1883
+        # Workers only publish; subscribing would make each of them receive
+        # every user's progress traffic
+        self.subscribe = subscribe
+        broker_host_raw, self.broker_port = parse_mqtt_broker(self.broker_url)
         
         # Auto-detect host IP if localhost is used (for Docker containers)
         if broker_host_raw in ['localhost', '127.0.0.1']:
@@ -85,103 +133,163 @@ class MQTTProgressManager:
         else:
             self.broker_host = broker_host_raw
         
-        self.client = mqtt.Client()
+        # Callback API v2 over MQTT 5; the client id is unique per process so
+        # API and worker processes never take over each other's session
+        self.client = mqtt.Client(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            client_id=f"freecad-{socket.gethostname()}-{os.getpid()}",
+            protocol=mqtt.MQTTv5,
+        )
         self.client.on_connect = self._on_connect
         self.client.on_message = self._on_message
         self.client.on_disconnect = self._on_disconnect
+        self.client.on_socket_open = self._on_socket_open
         
         # Store progress data
         self.progress_data: Dict[str, Dict[str, Any]] = {}
+        # Final job results pushed by workers on freecad/result/<user_id>
+        self.result_data: Dict[str, Dict[str, Any]] = {}
         self.lock = threading.Lock()
         
-        # Connection status
+        # MQTT 5 publish properties, built once: intermediate progress expires
+        # quickly, terminal progress stays deliverable as long as the RQ result
+        self._progress_props = Properties(PacketTypes.PUBLISH)
+        self._progress_props.MessageExpiryInterval = PROGRESS_EXPIRY
+        self._terminal_props = Properties(PacketTypes.PUBLISH)
+        self._terminal_props.MessageExpiryInterval = config.RESULT_TTL
+        
+        # Last intermediate progress update published per user, for deduplication
+        self._last_progress: Dict[str, tuple] = {}
+        
+        # MQTTMessageInfo of progress publishes not yet written out, oldest first
+        self._unsent_progress = deque()
+        self._unsent_lock = threading.Lock()
+        
+        # Throttled progress: last send time per user, and the latest update
+        # held back per user until its interval has passed
+        self._progress_sent_at: Dict[str, float] = {}
+        self._pending_progress: Dict[str, tuple] = {}
+        self._throttle_cond = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+        
+        # Last publish timestamp as (monotonic time, ISO string), reused for
+        # TIMESTAMP_RESOLUTION seconds
+        self._ts_cache = (float("-inf"), "")
+        
+        # Connection status: plain flag written only by the connect/disconnect
+        # callbacks, so request handlers can read it without any I/O
         self.connected = False
-        self.connection_thread = None
         
-    def _on_connect(self, client, userdata, flags, rc):
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
         """Callback when MQTT connection is established"""
-        if rc == 0:
+        if not reason_code.is_failure:
             print(f"MQTT connected to {self.broker_host}:{self.broker_port}")
             self.connected = True
+            if not self.subscribe:
+                return
             # Subscribe to progress topics
             client.subscribe("freecad/progress/+")
             client.subscribe("freecad/status/+")
+            client.subscribe("freecad/result/+")
         else:
-            print(f"MQTT connection failed with code {rc}")
+            print(f"MQTT connection failed with code {reason_code}")
             self.connected = False
     
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_socket_open(self, client, userdata, sock):
+        """Disable Nagle's algorithm so small publishes are sent immediately"""
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass
+    
+    def _on_disconnect(self, client, userdata, disconnect_flags, reason_code, properties):
         """Callback when MQTT disconnection occurs"""
-        print(f"MQTT disconnected with code {rc}")
+        print(f"MQTT disconnected with code {reason_code}")
         self.connected = False
+        # QoS 0 packets still queued are dropped with the connection
+        with self._unsent_lock:
+            self._unsent_progress.clear()
     
     def _on_message(self, client, userdata, msg):
         """Callback when message is received from MQTT"""
         try:
-            topic_parts = msg.topic.split("/")
-            if len(topic_parts) >= 3:
-                user_id = topic_parts[-1]  # Get user_id from topic
-                
+            # Topics are freecad/<kind>/<user_id>
+            prefix, sep, user_id = msg.topic.rpartition("/")
+            if sep and "/" in prefix:
                 # Parse message
-                message_data = json.loads(msg.payload.decode())
+                message_data = orjson.loads(msg.payload)
                 
+                if prefix.endswith("/result"):
+                    with self.lock:
+                        self.result_data[user_id] = message_data
+                    print(f"Stored result for user {user_id}, job {message_data.get('job_id')}")
+                    return
+                
+                # Build the update outside the lock to keep the critical section short
+                changes = {k: message_data[k] for k in PROGRESS_FIELDS if k in message_data}
+                changes["updated_at"] = datetime.now(timezone.utc).isoformat()
+                # Entries are copy-on-write: a new dict replaces the old one, so
+                # readers never see a half-updated entry and need no lock
                 with self.lock:
-                    if user_id not in self.progress_data:
-                        self.progress_data[user_id] = {
-                            "status": "unknown",
-                            "progress": 0,
-                            "message": "",
-                            "updated_at": None,
-                            "error": None
-                        }
-                    
-                    # Update progress data
-                    if "progress" in message_data:
-                        self.progress_data[user_id]["progress"] = message_data["progress"]
-                    if "status" in message_data:
-                        self.progress_data[user_id]["status"] = message_data["status"]
-                    if "message" in message_data:
-                        self.progress_data[user_id]["message"] = message_data["message"]
-                    if "error" in message_data:
-                        self.progress_data[user_id]["error"] = message_data["error"]
-                    
-                    self.progress_data[user_id]["updated_at"] = datetime.now(timezone.utc).isoformat()
-                    
+                    entry = self.progress_data.get(user_id) or DEFAULT_PROGRESS
+                    self.progress_data[user_id] = {**entry, **changes}
+                
                 print(f"Updated progress for user {user_id}: {message_data}")
                 
         except Exception as e:
             print(f"Error processing MQTT message: {e}")
     
     def start(self):
-        """Start MQTT connection"""
+        """Start MQTT connection; paho's network thread connects and reconnects in the background"""
         try:
-            self.connection_thread = threading.Thread(target=self._connect_loop, daemon=True)
-            self.connection_thread.start()
+            print(f"Connecting to MQTT broker at {self.broker_host}:{self.broker_port}")
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+            self.client.connect_async(self.broker_host, self.broker_port, 60, clean_start=True)
+            self.client.loop_start()
+            atexit.register(self.stop)
         except Exception as e:
             print(f"Error starting MQTT client: {e}")
     
-    def _connect_loop(self):
-        """MQTT connection loop"""
-        while True:
-            try:
-                if not self.connected:
-                    print(f"Connecting to MQTT broker at {self.broker_host}:{self.broker_port}")
-                    self.client.connect(self.broker_host, self.broker_port, 60)
-                    self.client.loop_start()
-                time.sleep(5)
-            except Exception as e:
-                print(f"MQTT connection error: {e}")
-                time.sleep(5)
+    def stop(self):
+        """Disconnect from the broker and stop the network thread"""
+        try:
+            self.client.disconnect()
+            self.client.loop_stop()
+        except Exception as e:
+            print(f"Error stopping MQTT client: {e}")
+    
+    def _timestamp(self) -> str:
+        """Current UTC time in ISO format, regenerated at most every TIMESTAMP_RESOLUTION seconds"""
+        mono = time.monotonic()
+        cached_at, ts = self._ts_cache
+        if mono - cached_at >= TIMESTAMP_RESOLUTION:
+            ts = datetime.now(timezone.utc).isoformat()
+            self._ts_cache = (mono, ts)
+        return ts
     
     def get_progress(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get progress for a specific user"""
+        """Get progress for a specific user (lock-free; the returned entry must not be mutated)"""
+        return self.progress_data.get(user_id)
+    
+    def get_result(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get the last result pushed for a specific user"""
         with self.lock:
-            return self.progress_data.get(user_id)
+            return self.result_data.get(user_id)
     
     def get_all_progress(self) -> Dict[str, Dict[str, Any]]:
-        """Get progress for all users"""
-        with self.lock:
-            return self.progress_data.copy()
+        """Get progress for all users (lock-free snapshot; entries must not be mutated)"""
+        # dict.copy() runs in C without releasing the GIL, so it is atomic
+        # with respect to writers inserting new users
+        return self.progress_data.copy()
+    
+    def _unsent_progress_count(self) -> int:
+        """Number of progress publishes still waiting to be written to the broker"""
+        with self._unsent_lock:
+            unsent = self._unsent_progress
+            # Messages go out in order, so written ones are at the front
+            while unsent and unsent[0].is_published():
+                unsent.popleft()
+            return len(unsent)
     
     def publish_progress(
         self,
@@ -191,11 +299,24 @@ class MQTTProgressManager:
         message: str = "",
         error: str = None,
     ) -> None:
-        """Publish progress update to MQTT"""
+        """Publish progress update to MQTT (repeated and backpressured intermediate updates are dropped)"""
         if not self.connected:
             print("MQTT not connected, cannot publish progress")
             return
         
+        terminal = status in TERMINAL_STATUSES
+        key = (progress, status, message, error)
+        if terminal:
+            self._last_progress.pop(user_id, None)
+        else:
+            if self._last_progress.get(user_id) == key:
+                return
+            # Outbound queue is backing up: skip intermediate frames, the next
+            # update supersedes them anyway
+            if progress not in (0, 100) and self._unsent_progress_count() > MAX_PENDING_PUBLISHES:
+                return
+            self._last_progress[user_id] = key
+        
         try:
             topic = f"freecad/progress/{user_id}"
             data = {
@@ -203,18 +324,87 @@ class MQTTProgressManager:
                 "progress": progress,
                 "status": status,
                 "message": message,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": self._timestamp()
             }
             
             if error:
                 data["error"] = error
             
-            self.client.publish(topic, json.dumps(data))
+            # Not retained: a retained outcome would be re-sent on every
+            # reconnect, also while the user's next job runs. Intermediate
+            # updates expire instead of queueing up stale
+            info = self.client.publish(
+                topic,
+                orjson.dumps(data),
+                qos=0,
+                retain=False,
+                properties=self._terminal_props if terminal else self._progress_props,
+            )
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                with self._unsent_lock:
+                    self._unsent_progress.append(info)
             print(f"Published progress for user {user_id}: {progress}% - {status}")
             
         except Exception as e:
             print(f"Error publishing progress: {e}")
     
+    def publish_progress_throttled(
+        self,
+        user_id: str,
+        progress: int,
+        status: str,
+        message: str = "",
+        error: str = None,
+        min_interval: float = PROGRESS_MIN_INTERVAL,
+    ) -> None:
+        """
+        Publish progress at most once per min_interval per user; updates in
+        between are coalesced and only the latest is sent. Terminal statuses
+        are published immediately.
+        """
+        with self._throttle_cond:
+            if status in TERMINAL_STATUSES:
+                # Drop the held-back update so it can never follow the outcome
+                self._pending_progress.pop(user_id, None)
+                self._progress_sent_at.pop(user_id, None)
+                self.publish_progress(user_id, progress, status, message, error)
+                return
+            
+            now = time.monotonic()
+            if (user_id not in self._pending_progress
+                    and now - self._progress_sent_at.get(user_id, float("-inf")) >= min_interval):
+                self._progress_sent_at[user_id] = now
+                self.publish_progress(user_id, progress, status, message, error)
+                return
+            
+            self._pending_progress[user_id] = ((progress, status, message, error), min_interval)
+            # Started lazily; a thread inherited over fork (RQ work horse) is not alive
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._flush_pending_progress, daemon=True)
+                self._flusher.start()
+            self._throttle_cond.notify()
+    
+    def _flush_pending_progress(self):
+        """Background thread: send each held-back update once its user's interval has passed"""
+        with self._throttle_cond:
+            while True:
+                while not self._pending_progress:
+                    self._throttle_cond.wait()
+                
+                now = time.monotonic()
+                next_due = None
+                for user_id, (args, interval) in list(self._pending_progress.items()):
+                    remaining = self._progress_sent_at.get(user_id, float("-inf")) + interval - now
+                    if remaining <= 0:
+                        del self._pending_progress[user_id]
+                        self._progress_sent_at[user_id] = now
+                        self.publish_progress(user_id, *args)
+                    elif next_due is None or remaining < next_due:
+                        next_due = remaining
+                
+                if next_due is not None:
+                    self._throttle_cond.wait(next_due)
+    
     def publish_status(
         self,
         user_id: str,
@@ -233,30 +423,96 @@ class MQTTProgressManager:
                 "user_id": user_id,
                 "status": status,
                 "message": message,
-                "timestamp": datetime.now(timezone.utc).isoformat()
+                "timestamp": self._timestamp()
             }
             
             if error:
                 data["error"] = error
             
-            self.client.publish(topic, json.dumps(data))
+            self.client.publish(topic, orjson.dumps(data))
             print(f"Published status for user {user_id}: {status}")
             
         except Exception as e:
             print(f"Error publishing status: {e}")
 
 
-# Global MQTT manager instance
-_mqtt_manager = None
-_mqtt_lock = threading.Lock()
+    def publish_status_and_progress(
+        self,
+        user_id: str,
+        status: str,
+        progress: int,
+        message: str = "",
+        error: str = None,
+        qos: int = 0,
+    ) -> None:
+        """Publish status and progress together as one message on the progress topic"""
+        if not self.connected:
+            print("MQTT not connected, cannot publish status and progress")
+            return
+        
+        try:
+            topic = f"freecad/progress/{user_id}"
+            data = {
+                "user_id": user_id,
+                "progress": progress,
+                "status": status,
+                "message": message,
+                "timestamp": self._timestamp()
+            }
+            
+            if error:
+                data["error"] = error
+            
+            self.client.publish(topic, orjson.dumps(data), qos=qos, retain=False, properties=self._progress_props)
+            print(f"Published status and progress for user {user_id}: {progress}% - {status}")
+            
+        except Exception as e:
+            print(f"Error publishing status and progress: {e}")
 
-def get_mqtt_manager() -> MQTTProgressManager:
-    """Get or create MQTT manager instance (singleton)"""
-    global _mqtt_manager
-    
-    with _mqtt_lock:
-        if _mqtt_manager is None:
-            _mqtt_manager = MQTTProgressManager()
-            _mqtt_manager.start()
+
+    def publish_result(
+        self,
+        user_id: str,
+        job_id: str,
+        files: list,
+    ) -> None:
+        """Publish the final result of a finished job to MQTT"""
+        if not self.connected:
+            print("MQTT not connected, cannot publish result")
+            return
         
-        return _mqtt_manager
+        try:
+            topic = f"freecad/result/{user_id}"
+            data = {
+                "user_id": user_id,
+                "job_id": job_id,
+                "status": "finished",
+                "files": files,
+                "completed_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+            }
+            
+            # QoS 1: the API serves /result from this message
+            self.client.publish(topic, orjson.dumps(data), qos=1)
+            print(f"Published result for user {user_id}: {len(files)} files")
+            
+        except Exception as e:
+            print(f"Error publishing result: {e}")
+
+
+# One manager per mode, keyed on bool(subscribe). Every client in a process
+# gets the same client id, so a duplicate would keep kicking the other one
+# off the broker.
+_mqtt_managers: Dict[bool, MQTTProgressManager] = {}
+_mqtt_managers_lock = threading.Lock()
+
+
+def get_mqtt_manager(subscribe: bool = True) -> MQTTProgressManager:
+    """Get or create MQTT manager instance (singleton, created on first call); publish-only when subscribe is False"""
+    key = bool(subscribe)
+    with _mqtt_managers_lock:
+        manager = _mqtt_managers.get(key)
+        if manager is None:
+            manager = MQTTProgressManager(subscribe=key)
+            manager.start()
+            _mqtt_managers[key] = manager
+        return manager
@@ -3,30 +3,47 @@
 SheetMetal workbench for FreeCAD
 """
 
-# Import all SheetMetal modules
-from . import SheetMetalTools
-from . import SheetMetalCmd
-from . import SheetMetalBaseShapeCmd
-from . import SheetMetalBaseCmd
-from . import SheetMetalBend
-from . import SheetMetalBendSolid
-from . import SheetMetalCornerReliefCmd
-from . import SheetMetalExtendCmd
-from . import SheetMetalFoldCmd
-from . import SheetMetalFormingCmd
-from . import SheetMetalJunction
-from . import SheetMetalKfactor
-from . import SheetMetalLogger
-from . import SheetMetalNewUnfolder
-from . import SheetMetalRelief
-from . import SheetMetalUnfoldCmd
-from . import SheetMetalUnfolder
-from . import SketchOnSheetMetalCmd
-from . import engineering_mode
-from . import ExtrudedCutout
-from . import lookup
-from . import smwb_locator
-from . import TestSheetMetal
+import importlib
+
+# SheetMetal modules are imported lazily on first attribute access (PEP 562),
+# so a process only pays for the ones it uses
+_SUBMODULES = frozenset({
+    'SheetMetalTools',
+    'SheetMetalCmd',
+    'SheetMetalBaseShapeCmd',
+    'SheetMetalBaseCmd',
+    'SheetMetalBend',
+    'SheetMetalBendSolid',
+    'SheetMetalCornerReliefCmd',
+    'SheetMetalExtendCmd',
+    'SheetMetalFoldCmd',
+    'SheetMetalFormingCmd',
+    'SheetMetalJunction',
+    'SheetMetalKfactor',
+    'SheetMetalLogger',
+    'SheetMetalNewUnfolder',
+    'SheetMetalRelief',
+    'SheetMetalUnfoldCmd',
+    'SheetMetalUnfolder',
+    'SketchOnSheetMetalCmd',
+    'engineering_mode',
+    'ExtrudedCutout',
+    'lookup',
+    'smwb_locator',
+    'TestSheetMetal',
+})
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
 
 __all__ = [
     'SheetMetalTools',
@@ -12,7 +12,6 @@ import logging
 os.environ['FAISS_DISABLE_GPU'] = '1'
 os.environ['CUDA_VISIBLE_DEVICES'] = ''
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
-os.environ['OMP_NUM_THREADS'] = '1'
 
 # Suppress FAISS GPU warnings
 logging.getLogger('faiss').setLevel(logging.ERROR)
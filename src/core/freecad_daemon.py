@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Persistent FreeCAD Script Daemon
+
+This script is designed to be executed once by freecadcmd at container start.
+It loads FreeCAD and the common workbench modules, then serves job requests
+on a UNIX socket. Every request is run in a process forked from the already
+initialized daemon, so jobs skip the freecadcmd startup and the fork keeps
+jobs isolated from each other (documents, modules, working directory).
+
+Protocol (one request per connection):
+- client sends one JSON line: {"script": <path>, "cwd": <dir>, "timeout": <seconds>}
+- daemon streams the script's combined stdout/stderr back
+- daemon ends with a line "###DONE:<exit code>###" ("###DONE:timeout###" on timeout)
+
+Usage (the directory of this script must be on PYTHONPATH):
+FREECAD_DAEMON_SOCKET=<socket_path> freecadcmd <path_to_this_script>
+"""
+
+import ctypes
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# Modules imported once in the daemon and shared by every forked job
+PRELOAD_MODULES = ("FreeCAD", "Part", "Mesh", "MeshPart", "Import", "step_converter", "script_runner")
+
+DONE_MARKER = "###DONE:{}###"
+
+
+def _flush_all():
+    """Flush Python and C stdio buffers before the process exits"""
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    try:
+        ctypes.CDLL(None).fflush(None)
+    except Exception:
+        pass
+
+
+def _run_job(conn, script_path, cwd):
+    """Job process: run the script with stdout/stderr sent to the client"""
+    code = 0
+    try:
+        # Own process group, so a timeout also kills the converter forks
+        os.setpgid(0, 0)
+        os.dup2(conn.fileno(), 1)
+        os.dup2(conn.fileno(), 2)
+        os.chdir(cwd)
+        os.environ["FREECAD_USER_SCRIPT"] = script_path
+
+        import script_runner
+        script_runner.main()
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    _flush_all()
+    os._exit(code)
+
+
+def _kill_group(pgid):
+    """SIGKILL every process of a job's process group"""
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _supervise(conn):
+    """Supervisor process: fork the job, enforce the timeout, report the exit code"""
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    try:
+        request = json.loads(conn.makefile("rb").readline())
+        script_path = request["script"]
+        cwd = request.get("cwd") or os.getcwd()
+        deadline = time.monotonic() + float(request.get("timeout", 3600))
+    except Exception as e:
+        conn.sendall(f"Invalid request: {e}\n{DONE_MARKER.format(1)}\n".encode())
+        os._exit(0)
+
+    pid = os.fork()
+    if pid == 0:
+        _run_job(conn, script_path, cwd)
+    try:
+        # Also set here: the job may not have run setpgid before a kill
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+
+    result = "timeout"
+    while time.monotonic() < deadline:
+        finished, status = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            result = os.waitstatus_to_exitcode(status)
+            break
+        time.sleep(0.1)
+    else:
+        _kill_group(pid)
+        os.waitpid(pid, 0)
+    # Leftover processes of the job would keep the client's socket open
+    _kill_group(pid)
+
+    try:
+        conn.sendall(f"\n{DONE_MARKER.format(result)}\n".encode())
+    except OSError:
+        pass
+    os._exit(0)
+
+
+def serve(socket_path):
+    """Accept requests forever, forking one supervisor per connection"""
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except (Exception, SystemExit) as e:
+            print(f"[WARNING] Could not preload {name}: {e}")
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(16)
+
+    # Supervisors are reaped automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    print(f"[OK] FreeCAD daemon listening on {socket_path}")
+    _flush_all()
+
+    while True:
+        conn, _ = server.accept()
+        if os.fork() == 0:
+            server.close()
+            _supervise(conn)
+        conn.close()
+
+
+def main():
+    """Main execution function"""
+    socket_path = os.environ.get("FREECAD_DAEMON_SOCKET")
+    if not socket_path:
+        print("[ERROR] FREECAD_DAEMON_SOCKET is not set")
+        sys.exit(1)
+    serve(socket_path)
+
+
+if __name__ == "__main__":
+    main()
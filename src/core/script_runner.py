@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+FreeCAD Script Runner
+
+This script is designed to be executed by freecadcmd in place of a user
+script. It runs the user script, then converts every STEP file the script
+wrote below the working directory into OnShape JSON (<name>.json next to
+<name>.step) in the same FreeCAD session, so the worker does not have to
+start freecadcmd again for each conversion.
+
+Usage (the directory of this script must be on PYTHONPATH):
+FREECAD_USER_SCRIPT=<path_to_user_script> freecadcmd <path_to_this_script>
+"""
+
+import os
+import runpy
+import sys
+from pathlib import Path
+
+
+def run_user_script(script_path: str) -> None:
+    """Run the user script as __main__; a clean sys.exit() is not an error"""
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+
+
+def _discard_json(step_path: Path) -> None:
+    """Remove the JSON (complete or partial) of a failed conversion"""
+    from step_converter import partial_json_path
+
+    json_path = step_path.with_suffix(".json")
+    json_path.unlink(missing_ok=True)
+    Path(partial_json_path(str(json_path))).unlink(missing_ok=True)
+
+
+def _convert_one(converter, step_path: Path) -> bool:
+    """Convert one STEP file; a failed conversion leaves no JSON behind"""
+    json_path = step_path.with_suffix(".json")
+    try:
+        # A failed conversion is left to the worker's standalone converter
+        if converter.convert(str(step_path), str(json_path)):
+            return True
+    except Exception as e:
+        print(f"[WARNING] In-process JSON conversion failed for {step_path}: {e}")
+    _discard_json(step_path)
+    return False
+
+
+def convert_step_outputs(output_dir: str) -> None:
+    """Convert each STEP file below output_dir to OnShape JSON next to it"""
+    try:
+        from step_converter import OnShapeJSONConverter
+    except Exception as e:
+        print(f"[WARNING] In-process JSON conversion not available: {e}")
+        return
+
+    converter = OnShapeJSONConverter()
+    step_paths = sorted(Path(output_dir).rglob("*.step"))
+    if len(step_paths) <= 1 or not hasattr(os, "fork"):
+        for step_path in step_paths:
+            _convert_one(converter, step_path)
+        return
+
+    # Tessellation holds the GIL, so files are converted in forked copies of
+    # this already initialized FreeCAD process, one per core at most
+    max_workers = min(len(step_paths), os.cpu_count() or 1)
+    running = {}
+
+    def reap_one():
+        # A child killed inside OCCT (segfault, OOM) never cleans up itself
+        pid, status = os.wait()
+        step_path = running.pop(pid, None)
+        if step_path is not None and os.waitstatus_to_exitcode(status) != 0:
+            _discard_json(step_path)
+
+    for step_path in step_paths:
+        if len(running) >= max_workers:
+            reap_one()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                ok = _convert_one(converter, step_path)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(0 if ok else 1)
+        running[pid] = step_path
+    while running:
+        reap_one()
+
+
+def main():
+    """Main execution function"""
+    script_path = os.environ.get("FREECAD_USER_SCRIPT")
+    if not script_path:
+        print("[ERROR] FREECAD_USER_SCRIPT is not set")
+        sys.exit(1)
+
+    # The user script may chdir(); conversion stays in the job directory
+    output_dir = os.getcwd()
+    run_user_script(script_path)
+
+    if os.environ.get("FREECAD_CONVERT_JSON", "1") != "0":
+        convert_step_outputs(output_dir)
+
+
+if __name__ == "__main__":
+    main()
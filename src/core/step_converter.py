@@ -6,14 +6,17 @@ This script is designed to be executed by freecadcmd.exe and converts a
 STEP file into an OnShape-compatible JSON format.
 
 Usage:
-freecadcmd.exe <path_to_script> <input_step_path> <output_json_path>
+python <path_to_script> <input_step_path> <output_json_path>
+STEP_CONVERTER_INPUT=<input_step_path> STEP_CONVERTER_OUTPUT=<output_json_path> freecadcmd <path_to_script>
 """
 
 import os
-import json
 import sys
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List
+
+import numpy as np
+import orjson
 
 # Try to import FreeCAD modules. This will only work when run with freecadcmd.
 try:
@@ -27,14 +30,31 @@ except ImportError:
     sys.exit(1)
 
 # --- Configuration ---
-FREECAD_MESH_CONFIG = {
-    "LINEAR_DEFLECTION": 0.1,
-    "ANGULAR_DEFLECTION": 0.1,
-    "RELATIVE": False
-}
+# Absolute tessellation tolerances (model units / radians); bound as default arguments
+LINEAR_DEFLECTION = 0.1
+ANGULAR_DEFLECTION = 0.1
 EDGE_PROCESSING_CONFIG = {
     "POINTS_PER_EDGE": 10
 }
+# Fixed framing around the streamed faces array of the OnShape JSON
+FACES_JSON_PREFIX = (
+    b'{"faces":{"btType":"BTExportTessellatedFacesResponse-898",'
+    b'"bodies":[{"btType":"BTExportTessellatedFacesBody-1321","facetPoints":[],"faces":['
+)
+FACES_JSON_SUFFIX = b']}]},"edges":'
+# btType tags repeated for every vertex/facet; one shared string object each
+VECTOR_BT_TYPE = sys.intern("BTVector3d-389")
+FACET_BT_TYPE = sys.intern("BTExportTessellatedFacesFacet-1417")
+# Shared immutable value for the always-empty facet arrays (encoded as [])
+EMPTY_ARRAY = ()
+# Decimals kept per coordinate; well below STEP tolerances and keeps the JSON short
+COORDINATE_DECIMALS = 4
+# Samples per edge, resolved once instead of per edge
+EDGE_SAMPLE_COUNT = EDGE_PROCESSING_CONFIG["POINTS_PER_EDGE"] + 1
+
+def partial_json_path(json_path: str) -> str:
+    """Path the JSON is streamed to before it is moved to json_path"""
+    return f"{json_path}.partial"
 
 # --- Utility Classes ---
 class FreeCADUtils:
@@ -50,47 +70,69 @@ class FreeCADUtils:
             return None
 
     @staticmethod
-    def create_mesh_from_shape(shape, linear_deflection: float = None, angular_deflection: float = None):
+    def tessellate_faces(shape, tolerance: float = LINEAR_DEFLECTION,
+                         angular_deflection: float = ANGULAR_DEFLECTION) -> Iterator:
+        """Triangulate the shape once, then yield (points, triangles) per face"""
         try:
-            mesh = MeshPart.meshFromShape(
+            # One OCCT pass with the angular limit stores a triangulation on every
+            # face of the shape; the per-face calls below only read it back
+            # instead of re-meshing (Shape.tessellate has no angular argument
+            # and would fall back to OCCT's much coarser 0.5 rad)
+            MeshPart.meshFromShape(
                 Shape=shape,
-                LinearDeflection=linear_deflection or FREECAD_MESH_CONFIG["LINEAR_DEFLECTION"],
-                AngularDeflection=angular_deflection or FREECAD_MESH_CONFIG["ANGULAR_DEFLECTION"],
-                Relative=FREECAD_MESH_CONFIG["RELATIVE"]
+                LinearDeflection=tolerance,
+                AngularDeflection=angular_deflection,
+                Relative=False
             )
-            return mesh
         except Exception as e:
-            print(f"[ERROR] Failed to create mesh: {e}")
-            return None
+            print(f"[ERROR] Failed to tessellate shape: {e}")
+            return
+
+        for face in FreeCADUtils.iter_elements(shape, "Face"):
+            try:
+                tessellation = face.tessellate(tolerance)
+            except Exception as e:
+                print(f"[ERROR] Failed to tessellate face: {e}")
+                tessellation = None
+            yield tessellation
 
     @staticmethod
-    def extract_individual_faces(shape) -> List:
+    def iter_elements(shape, element_type: str) -> Iterator:
+        """Yield sub-shapes ("Face", "Edge") one at a time; shape.Faces/Edges build the full list"""
         try:
-            return list(shape.Faces)
+            count = shape.countElement(element_type)
         except Exception as e:
-            print(f"[ERROR] Failed to extract individual faces: {e}")
-            return []
+            print(f"[ERROR] Failed to count {element_type} elements: {e}")
+            return
+        for index in range(1, count + 1):
+            yield shape.getElement(f"{element_type}{index}")
 
     @staticmethod
     def extract_edges_data(shape, edge_id_prefix: str = "Edge") -> List[Dict[str, Any]]:
         edges_data = []
         try:
-            for i, edge in enumerate(shape.Edges):
+            for i, edge in enumerate(FreeCADUtils.iter_elements(shape, "Edge")):
                 vertices = []
                 try:
-                    curve = edge.Curve
-                    params = [edge.FirstParameter + (edge.LastParameter - edge.FirstParameter) * j / EDGE_PROCESSING_CONFIG["POINTS_PER_EDGE"] for j in range(EDGE_PROCESSING_CONFIG["POINTS_PER_EDGE"] + 1)]
-                    points = [curve.value(param) for param in params]
+                    # Sample the whole edge in one C++ call, then convert the
+                    # points to plain floats row by row through NumPy
+                    points = edge.discretize(Number=EDGE_SAMPLE_COUNT)
+                    coords = np.fromiter(
+                        (c for p in points for c in (p.x, p.y, p.z)),
+                        dtype=np.float64,
+                        count=3 * len(points),
+                    ).reshape(-1, 3).round(COORDINATE_DECIMALS)
                     vertices = [{
-                        "btType": "BTVector3d-389",
-                        "x": float(p.x), "y": float(p.y), "z": float(p.z)
-                    } for p in points]
+                        "btType": VECTOR_BT_TYPE,
+                        "x": x, "y": y, "z": z
+                    } for x, y, z in coords.tolist()]
                 except Exception:
                     start_point = edge.firstVertex().Point
                     end_point = edge.lastVertex().Point
                     vertices = [
-                        {"btType": "BTVector3d-389", "x": float(start_point.x), "y": float(start_point.y), "z": float(start_point.z)},
-                        {"btType": "BTVector3d-389", "x": float(end_point.x), "y": float(end_point.y), "z": float(end_point.z)}
+                        {"btType": VECTOR_BT_TYPE, "x": round(float(point.x), COORDINATE_DECIMALS),
+                         "y": round(float(point.y), COORDINATE_DECIMALS), "z": round(float(point.z), COORDINATE_DECIMALS)}
+                        for point in (start_point, end_point)
                     ]
                 
                 edges_data.append({
@@ -137,74 +179,93 @@ class OnShapeJSONConverter:
                 return False
             print(f"[OK] Found {len(shape_objects)} shape objects")
 
-            all_faces = []
             all_edges = []
+            first_face = True
+            partial_path = partial_json_path(json_path)
 
-            for obj in shape_objects:
-                shape = obj.Shape
-                individual_faces = FreeCADUtils.extract_individual_faces(shape)
-                for i, face_shape in enumerate(individual_faces):
-                    mesh = FreeCADUtils.create_mesh_from_shape(face_shape)
-                    if not mesh: continue
-                    
-                    facets = []
-                    for facet in mesh.Facets:
-                        vertices = [{
-                            "btType": "BTVector3d-389",
-                            "x": p.x, "y": p.y, "z": p.z
-                        } for p in (mesh.Points[idx] for idx in facet.PointIndices)]
-                        facets.append({
-                            "btType": "BTExportTessellatedFacesFacet-1417",
-                            "vertices": vertices, "indices": [], "normals": [], "textureCoordinates": []
-                        })
-                    all_faces.append({
-                        "btType": "BTExportTessellatedFacesFace-1192",
-                        "id": f"Jf{chr(65 + i)}",
-                        "facets": facets
-                    })
-                all_edges.extend(FreeCADUtils.extract_edges_data(shape, obj.Name))
-
-            json_data = {
-                "faces": {
-                    "btType": "BTExportTessellatedFacesResponse-898",
-                    "bodies": [{
-                        "btType": "BTExportTessellatedFacesBody-1321",
-                        "facetPoints": [],
-                        "faces": all_faces
-                    }]
-                },
-                "edges": {
+            # Faces are streamed to the file one at a time, so peak memory is
+            # a single face rather than the whole tessellated model. The stream
+            # goes to a side file that only replaces json_path once complete,
+            # so a crash mid-write never leaves a truncated JSON behind
+            with open(partial_path, 'wb') as f:
+                f.write(FACES_JSON_PREFIX)
+                for obj in shape_objects:
+                    shape = obj.Shape
+                    face_tessellations = FreeCADUtils.tessellate_faces(shape)
+                    for i, tessellation in enumerate(face_tessellations):
+                        if not tessellation: continue
+                        
+                        # Read points and triangle indices in bulk, then gather the
+                        # (N, 3, 3) triangle coordinates with one NumPy fancy index
+                        points, triangles = tessellation
+                        point_coords = np.fromiter(
+                            (c for p in points for c in (p.x, p.y, p.z)),
+                            dtype=np.float64,
+                            count=3 * len(points),
+                        ).reshape(-1, 3).round(COORDINATE_DECIMALS)
+                        triangle_coords = point_coords[np.asarray(triangles, dtype=np.int64).reshape(-1, 3)]
+                        
+                        # Facets share the tag strings and empty arrays instead of
+                        # allocating three new lists per triangle
+                        facets = [{
+                            "btType": FACET_BT_TYPE,
+                            "vertices": [{
+                                "btType": VECTOR_BT_TYPE,
+                                "x": x, "y": y, "z": z
+                            } for x, y, z in triangle],
+                            "indices": EMPTY_ARRAY, "normals": EMPTY_ARRAY, "textureCoordinates": EMPTY_ARRAY
+                        } for triangle in triangle_coords.tolist()]
+                        if not first_face:
+                            f.write(b',')
+                        first_face = False
+                        f.write(orjson.dumps({
+                            "btType": "BTExportTessellatedFacesFace-1192",
+                            "id": f"Jf{chr(65 + i)}",
+                            "facets": facets
+                        }))
+                    all_edges.extend(FreeCADUtils.extract_edges_data(shape, obj.Name))
+
+                # Edges are one short polyline each, small enough to encode at once
+                f.write(FACES_JSON_SUFFIX)
+                f.write(orjson.dumps({
                     "btType": "BTExportTessellatedEdgesResponse-327",
                     "bodies": [{
                         "btType": "BTExportTessellatedEdgesBody-1324",
                         "edges": all_edges
                     }] if all_edges else []
-                }
-            }
-
-            with open(json_path, 'w') as f:
-                json.dump(json_data, f, indent=2)
+                }))
+                f.write(b'}')
+            os.replace(partial_path, json_path)
             
             print(f"[OK] OnShape JSON exported to: {json_path}")
             return True
 
         except Exception as e:
             print(f"[ERROR] OnShape JSON conversion failed: {e}")
+            # Do not leave a truncated stream behind
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
             return False
         finally:
             FreeCADUtils.cleanup_document(doc)
 
 def main():
     """Main execution function"""
-    # We expect sys.argv to be [script_path, input_step, output_json]
-    if len(sys.argv) != 3:
+    # We expect sys.argv to be [script_path, input_step, output_json]. Under
+    # freecadcmd the paths come from STEP_CONVERTER_INPUT/STEP_CONVERTER_OUTPUT,
+    # since freecadcmd would try to open extra arguments as documents
+    if len(sys.argv) == 3:
+        input_step = sys.argv[1]
+        output_json = sys.argv[2]
+    else:
+        input_step = os.environ.get("STEP_CONVERTER_INPUT")
+        output_json = os.environ.get("STEP_CONVERTER_OUTPUT")
+
+    if not input_step or not output_json:
         print(f"[ERROR] Invalid arguments. Usage: <script> <input_step> <output_json>")
         print(f"[DEBUG] Received arguments ({len(sys.argv)}): {sys.argv}")
         sys.exit(1)
 
-    input_step = sys.argv[1]
-    output_json = sys.argv[2]
-
     print("--- Starting STEP to OnShape JSON Conversion ---")
     print(f"Input: {input_step}")
     print(f"Output: {output_json}")
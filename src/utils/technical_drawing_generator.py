@@ -223,16 +223,17 @@ class TechnicalDrawingGenerator:
         svg_output_str = str(svg_output_path.absolute()).replace('\\', '/')
         template_str = str((self.templates_dir / self.template_name).absolute()).replace('\\', '/')
 
-        # Replace the configuration section
+        # Replace the configuration section; paths are emitted with repr() so
+        # quotes or backslashes in them stay valid Python string literals
         config_replacement = f'''# --- Configuration ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 step_file_name = "sheet.step"
 output_svg_name = "output.svg"
 template_name = "A4_TOLERY.svg"
 
-STEP_FILE_PATH = r"{step_file_str}"
-OUTPUT_SVG_PATH = r"{svg_output_str}"
-TEMPLATE_PATH = r"{template_str}"'''
+STEP_FILE_PATH = {step_file_str!r}
+OUTPUT_SVG_PATH = {svg_output_str!r}
+TEMPLATE_PATH = {template_str!r}'''
 
         # Find and replace the configuration section
         import re
@@ -240,9 +241,11 @@ TEMPLATE_PATH = r"{template_str}"'''
         # Pattern to match the configuration section
         config_pattern = r'# --- Configuration ---.*?TEMPLATE_PATH = os\.path\.join\(script_dir, "templates", template_name\)'
 
+        # A function replacement inserts the text as-is; a string would have its
+        # backslash escapes processed by re.sub
         modified_script = re.sub(
             config_pattern,
-            config_replacement,
+            lambda _: config_replacement,
             base_script,
             flags=re.DOTALL
         )
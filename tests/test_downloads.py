@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+from downloads import x_accel_redirect_uri
+
+
+class TestXAccelRedirectUri(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = self._tmp.name
+        os.makedirs(os.path.join(self.root, "storage"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_plain_filename(self):
+        path = os.path.join(self.root, "storage", "part_user1.step")
+        self.assertEqual(
+            x_accel_redirect_uri(path, self.root, "/internal/"),
+            "/internal/storage/part_user1.step",
+        )
+
+    def test_reserved_and_non_latin1_characters_are_encoded(self):
+        path = os.path.join(self.root, "storage", "chi tiết?#100%_user1.step")
+        uri = x_accel_redirect_uri(path, self.root, "/internal")
+        self.assertEqual(uri, "/internal/storage/chi%20ti%E1%BA%BFt%3F%23100%25_user1.step")
+        # Must be sendable as an HTTP header value
+        uri.encode("latin-1")
+
+    def test_path_outside_root(self):
+        self.assertIsNone(x_accel_redirect_uri("/etc/passwd", self.root, "/internal/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,20 @@
 import os
+import re
 import sys
 import tempfile
 import shutil
+import selectors
+import signal
+import socket
 import subprocess
 import uuid
-import threading
 import time
 import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Any
 from pathlib import Path
+from rq import get_current_job
 from mqtt_client import get_mqtt_manager
 
 STORAGE_PATH = os.getenv("STORAGE_PATH", "/app/storage")
@@ -18,6 +24,20 @@ os.makedirs(STORAGE_PATH, exist_ok=True)
 sys.path.append('/app/src/utils')
 sys.path.append('/app/src/core')
 
+# Runs the user script and converts its STEP outputs to JSON in the same freecadcmd process
+SCRIPT_RUNNER_PATH = '/app/src/core/script_runner.py'
+# Standalone STEP -> OnShape JSON converter, used when the runner's conversion failed
+STEP_CONVERTER_PATH = '/app/src/core/step_converter.py'
+
+# UNIX socket of the persistent FreeCAD daemon (src/core/freecad_daemon.py);
+# empty = start a new freecadcmd for every job
+FREECAD_DAEMON_SOCKET = os.getenv("FREECAD_DAEMON_SOCKET", "")
+
+# Lines of FreeCAD output kept per stream for diagnostics; the rest is only logged
+OUTPUT_TAIL_LINES = 200
+# FreeCAD's console progress indicator, e.g. "(42.5 %)"
+FREECAD_PROGRESS_RE = re.compile(r'\((\d+(?:\.\d+)?)\s*%\)')
+
 
 def generate_pdf_from_step(step_file_path: str, user_id: str) -> Dict[str, Any]:
     """
@@ -29,7 +49,8 @@ def generate_pdf_from_step(step_file_path: str, user_id: str) -> Dict[str, Any]:
         print(f"Generating PDF from STEP file: {step_file_path} for user: {user_id}")
         
         # Create output directory for PDF
-        pdf_output_dir = Path(STORAGE_PATH) / f"pdf_user_{user_id}"
+        # One directory per STEP file: conversions for the same user run concurrently
+        pdf_output_dir = Path(STORAGE_PATH) / f"pdf_user_{user_id}_{Path(step_file_path).stem}"
         pdf_output_dir.mkdir(parents=True, exist_ok=True)
         
         # Create base filename from step file
@@ -44,10 +65,17 @@ def generate_pdf_from_step(step_file_path: str, user_id: str) -> Dict[str, Any]:
         )
         
         if result["success"] and result["pdf_path"]:
-            # Copy PDF to main storage
+            # Move PDF to main storage; the temp directory lives in STORAGE_PATH,
+            # so this is normally a rename with no bytes copied
             pdf_source = Path(result["pdf_path"])
             pdf_dest = Path(STORAGE_PATH) / f"{base_filename}.pdf"
-            shutil.copy2(pdf_source, pdf_dest)
+            try:
+                os.replace(pdf_source, pdf_dest)
+            except OSError:
+                try:
+                    os.link(pdf_source, pdf_dest)
+                except OSError:
+                    shutil.copyfile(pdf_source, pdf_dest)
             
             # Cleanup temp directory
             shutil.rmtree(pdf_output_dir, ignore_errors=True)
@@ -90,42 +118,25 @@ def generate_json_from_step(step_file_path: str, user_id: str) -> Dict[str, Any]
         base_filename = f"{step_path.stem}_{user_id}"
         json_dest = Path(STORAGE_PATH) / f"{base_filename}.json"
         
-        # Create script to run step_converter
-        converter_script = f"""
-import sys
-sys.path.append('/app/src/core')
-from step_converter import OnShapeJSONConverter
-
-converter = OnShapeJSONConverter()
-success = converter.convert('{step_file_path}', '{json_dest}')
-if success:
-    print("JSON conversion completed successfully!")
-else:
-    print("JSON conversion failed!")
-    sys.exit(1)
-"""
-        
-        # Save temporary script
-        script_path = Path(STORAGE_PATH) / f"converter_{user_id}.py"
-        with open(script_path, 'w') as f:
-            f.write(converter_script)
-        
-        # Run script with freecadcmd (increased timeout for heavy files)
-        print(f"Running JSON converter script: {script_path}")
+        # Run step_converter directly with freecadcmd (increased timeout for heavy
+        # files). freecadcmd would open extra arguments as documents, so the
+        # paths go through the environment
+        print(f"Running JSON converter: {STEP_CONVERTER_PATH} {step_file_path} -> {json_dest}")
         result = subprocess.run(
-            ["freecadcmd", str(script_path)],
+            ["freecadcmd", STEP_CONVERTER_PATH],
             capture_output=True,
             text=True,
-            timeout=3600  # 1 hour timeout for heavy files
+            timeout=3600,  # 1 hour timeout for heavy files
+            env={
+                **os.environ,
+                "STEP_CONVERTER_INPUT": str(step_file_path),
+                "STEP_CONVERTER_OUTPUT": str(json_dest),
+            }
         )
         
-        # Cleanup script
-        try:
-            os.remove(script_path)
-        except:
-            pass
-        
         if result.returncode != 0:
+            # step_converter streams to <json>.partial; a crash can leave it behind
+            Path(f"{json_dest}.partial").unlink(missing_ok=True)
             error_msg = f"FreeCAD command failed with return code {result.returncode}"
             if result.stderr:
                 error_msg += f": {result.stderr[:500]}"  # Limit error message length
@@ -170,13 +181,6 @@ else:
         error_msg = "JSON generation timed out after 1 hour. This may happen with very large/complex STEP files."
         print(f"Error generating JSON: {error_msg}")
         print(f"Exception: {e}")
-        # Cleanup script on timeout
-        try:
-            script_path = Path(STORAGE_PATH) / f"converter_{user_id}.py"
-            if script_path.exists():
-                os.remove(script_path)
-        except:
-            pass
         return {
             "status": "failed",
             "error": error_msg,
@@ -195,11 +199,150 @@ else:
         }
 
 
+def _scan_output_files(directory: str, suffixes) -> list:
+    """Return paths of files below directory whose names end with one of suffixes"""
+    found = []
+    # scandir entries carry their type, so there is no extra stat per file
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                found.extend(_scan_output_files(entry.path, suffixes))
+            elif entry.name.endswith(suffixes):
+                found.append(entry.path)
+    return found
+
+
+def _split_output_lines(pending: bytes, data: bytes):
+    """Split pending + data on line ends; return (complete lines, unfinished rest)"""
+    *lines, rest = re.split(rb'[\r\n]', pending + data)
+    return [line.decode(errors="replace") for line in lines if line], rest
+
+
+def _run_in_freecad_daemon(script_path: str, cwd: str, timeout: int, on_line=None):
+    """
+    Run a script in a process forked from the persistent FreeCAD daemon
+    (src/core/freecad_daemon.py). Returns (returncode, stdout, stderr); stderr is
+    merged into stdout by the daemon.
+    """
+    request = json.dumps({"script": os.path.abspath(script_path), "cwd": cwd, "timeout": timeout})
+    output = deque(maxlen=OUTPUT_TAIL_LINES)
+    pending = b""
+    code = None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        # The daemon enforces the timeout itself; this only guards a hung daemon
+        sock.settimeout(timeout + 30)
+        sock.connect(FREECAD_DAEMON_SOCKET)
+        sock.sendall(request.encode() + b"\n")
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            lines, pending = _split_output_lines(pending, data)
+            for line in lines:
+                # The daemon's own marker is always the last line
+                if line.startswith("###DONE:") and line.endswith("###"):
+                    code = line[len("###DONE:"):-len("###")]
+                    break
+                output.append(line)
+                if on_line:
+                    on_line(line)
+            if code is not None:
+                break
+    
+    if code is None:
+        raise RuntimeError("FreeCAD daemon closed the connection without an exit code")
+    if code == "timeout":
+        raise subprocess.TimeoutExpired(["freecad_daemon", script_path], timeout, output="\n".join(output))
+    return int(code), "\n".join(output), ""
+
+
+def _kill_process_group(process):
+    """SIGKILL every process of the group started for process"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def _run_freecad_script(cmd, script_path: str, cwd: str, timeout: int, on_line=None):
+    """
+    Run a user script with FreeCAD, through the persistent daemon when it is
+    enabled (FREECAD_DAEMON_SOCKET) and reachable, else with a fresh freecadcmd.
+    Output is passed to on_line as it arrives; only the last OUTPUT_TAIL_LINES
+    lines per stream are kept. Returns (returncode, stdout tail, stderr tail);
+    raises subprocess.TimeoutExpired.
+    """
+    if FREECAD_DAEMON_SOCKET and os.path.exists(FREECAD_DAEMON_SOCKET):
+        try:
+            return _run_in_freecad_daemon(script_path, cwd, timeout, on_line)
+        except (ConnectionError, FileNotFoundError) as e:
+            print(f"⚠️ FreeCAD daemon unavailable, starting freecadcmd instead: {e}")
+    
+    deadline = time.monotonic() + timeout
+    # New session: the runner's converter forks share the process group and
+    # are killed together with freecadcmd
+    with subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True,
+        cwd=cwd,
+        env={
+            **os.environ,
+            "PYTHONPATH": "/app:/app/src/core:/usr/lib/freecad/lib:/usr/lib/python3/dist-packages",
+            "FREECAD_USER_SCRIPT": os.path.abspath(script_path),
+        }
+    ) as process:
+        tails = {
+            process.stdout: deque(maxlen=OUTPUT_TAIL_LINES),
+            process.stderr: deque(maxlen=OUTPUT_TAIL_LINES),
+        }
+        pending = dict.fromkeys(tails, b"")
+        
+        # Drain both pipes as data arrives instead of buffering the whole run
+        with selectors.DefaultSelector() as selector:
+            for stream in tails:
+                selector.register(stream, selectors.EVENT_READ)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    _kill_process_group(process)
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                events = selector.select(timeout=min(remaining, 1.0))
+                if not events and process.poll() is not None:
+                    # freecadcmd is done; only leftover children hold the pipes
+                    break
+                for key, _ in events:
+                    stream = key.fileobj
+                    data = os.read(stream.fileno(), 65536)
+                    if not data:
+                        selector.unregister(stream)
+                        data = b"\n"  # Flush an unterminated last line
+                    lines, pending[stream] = _split_output_lines(pending[stream], data)
+                    for line in lines:
+                        tails[stream].append(line)
+                        if on_line:
+                            on_line(line)
+        
+        for stream, rest in pending.items():
+            if rest:
+                line = rest.decode(errors="replace")
+                tails[stream].append(line)
+                if on_line:
+                    on_line(line)
+        try:
+            returncode = process.wait(timeout=max(deadline - time.monotonic(), 0))
+        finally:
+            # On timeout, and for children left running after a normal exit
+            _kill_process_group(process)
+    return returncode, "\n".join(tails[process.stdout]), "\n".join(tails[process.stderr])
+
+
 def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, Any]:
     """
     Execute FreeCAD script using freecadcmd
     """
-    mqtt_manager = get_mqtt_manager()
+    mqtt_manager = get_mqtt_manager(subscribe=False)
     
     try:
         if user_id is None:
@@ -209,85 +352,58 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
         
         # Publish initial status
         mqtt_manager.publish_status(user_id, "started", "Starting FreeCAD script execution")
-        mqtt_manager.publish_progress(user_id, 0, "started", "Initializing...")
+        mqtt_manager.publish_progress_throttled(user_id, 0, "started", "Initializing...")
         
         # Create output directory for this user
         user_output_dir = os.path.join(STORAGE_PATH, f"user_{user_id}")
         os.makedirs(user_output_dir, exist_ok=True)
         
         # Update progress
-        mqtt_manager.publish_progress(user_id, 10, "running", "Setting up output directory...")
+        mqtt_manager.publish_progress_throttled(user_id, 10, "running", "Setting up output directory...")
         
-        # Run script using Python with FreeCAD modules
-        cmd = ["freecadcmd", script_path]
-        print(f"Executing command: {' '.join(cmd)}")
+        # Run script using Python with FreeCAD modules (through the runner, which
+        # also converts the STEP outputs to JSON while FreeCAD is loaded)
+        cmd = ["freecadcmd", SCRIPT_RUNNER_PATH]
+        print(f"Executing command: {' '.join(cmd)} (script: {script_path})")
         
         # Update progress
-        mqtt_manager.publish_progress(user_id, 20, "running", "Executing FreeCAD script...")
-        
-        # Start heartbeat thread to publish progress updates while FreeCAD is running
-        heartbeat_stop = threading.Event()
-        heartbeat_progress = {"value": 25}  # Start at 25%
-        
-        def heartbeat_worker():
-            """Publish progress updates every 5 seconds while FreeCAD is running"""
-            while not heartbeat_stop.is_set():
-                heartbeat_progress["value"] = min(heartbeat_progress["value"] + 2, 35)  # Gradually increase to 35%
-                mqtt_manager.publish_progress(
-                    user_id, 
-                    heartbeat_progress["value"], 
-                    "running", 
-                    f"FreeCAD script is running... (progress: {heartbeat_progress['value']}%)"
+        mqtt_manager.publish_progress_throttled(user_id, 20, "running", "Executing FreeCAD script...")
+        
+        def on_freecad_output(line):
+            """Log FreeCAD output live and publish its own progress indicator"""
+            print(f"FreeCAD: {line}")
+            match = FREECAD_PROGRESS_RE.search(line)
+            if match:
+                # Map FreeCAD's 0-100% onto this stage's 20-39% band
+                percent = min(float(match.group(1)), 100.0)
+                mqtt_manager.publish_progress_throttled(
+                    user_id,
+                    20 + int(percent * 0.19),
+                    "running",
+                    f"FreeCAD script is running... ({percent:.0f}%)"
                 )
-                if heartbeat_stop.wait(timeout=5):  # Wait 5 seconds or until stop event
-                    break
-        
-        heartbeat_thread = threading.Thread(target=heartbeat_worker, daemon=True)
-        heartbeat_thread.start()
         
+        # Wait for the script with timeout (increased for heavy files)
         try:
-            # Use Popen to allow monitoring, but still wait for completion
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            text=True,
-            cwd=user_output_dir,
-            env={**os.environ, "PYTHONPATH": "/app:/usr/lib/freecad/lib:/usr/lib/python3/dist-packages"}
-        )
-            
-            # Wait for process with timeout (increased for heavy files)
-            try:
-                stdout, stderr = process.communicate(timeout=3600)  # 1 hour timeout for heavy files
-                returncode = process.returncode
-            except subprocess.TimeoutExpired:
-                process.kill()
-                stdout, stderr = process.communicate()
-                returncode = -1
-                error_msg = "FreeCAD command timed out after 1 hour"
-                heartbeat_stop.set()
-                mqtt_manager.publish_status(user_id, "failed", error_msg, None)
-                mqtt_manager.publish_progress(user_id, 0, "failed", error_msg, None)
-                return {
-                    "status": "failed",
-                    "error": error_msg
-                }
-            
-            result = type('obj', (object,), {
-                'returncode': returncode,
-                'stdout': stdout,
-                'stderr': stderr
-            })()
-            
-        finally:
-            # Stop heartbeat
-            heartbeat_stop.set()
-            heartbeat_thread.join(timeout=1)
+            returncode, stdout, stderr = _run_freecad_script(
+                cmd, script_path, user_output_dir, timeout=3600, on_line=on_freecad_output
+            )
+        except subprocess.TimeoutExpired:
+            error_msg = "FreeCAD command timed out after 1 hour"
+            mqtt_manager.publish_status(user_id, "failed", error_msg, None)
+            mqtt_manager.publish_progress_throttled(user_id, 0, "failed", error_msg, None)
+            return {
+                "status": "failed",
+                "error": error_msg
+            }
+        
+        result = type('obj', (object,), {
+            'returncode': returncode,
+            'stdout': stdout,
+            'stderr': stderr
+        })()
         
         print(f"FreeCAD command exit code: {result.returncode}")
-        print(f"FreeCAD stdout: {result.stdout}")
-        if result.stderr:
-            print(f"FreeCAD stderr: {result.stderr}")
         
         if result.returncode != 0:
             error_msg = f"FreeCAD command failed with exit code {result.returncode}"
@@ -301,7 +417,7 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
                 "stderr_tail": stderr_tail,
             }
             mqtt_manager.publish_status(user_id, "failed", error_msg, str(details))
-            mqtt_manager.publish_progress(user_id, 0, "failed", error_msg, str(details))
+            mqtt_manager.publish_progress_throttled(user_id, 0, "failed", error_msg, str(details))
             return {
                 "status": "failed",
                 "error": error_msg,
@@ -309,57 +425,62 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
             }
         
         # Update progress after successful execution
-        mqtt_manager.publish_progress(user_id, 40, "running", "FreeCAD script executed successfully, searching for generated files...")
+        mqtt_manager.publish_progress_throttled(user_id, 40, "running", "FreeCAD script executed successfully, searching for generated files...")
         
         # Find generated files
         generated_files = []
+        # STEP path in storage -> JSON converted by the runner in the same session
+        converted_json = {}
         
         # Update progress
-        mqtt_manager.publish_progress(user_id, 50, "running", "Searching for generated files...")
-        
-        # Find files in user output directory
-        for root, dirs, files in os.walk(user_output_dir):
-            for file in files:
-                if file.endswith(('.step', '.obj')):
-                    file_path = os.path.join(root, file)
-                    # Copy file to main storage with filename containing user_id
-                    new_filename = f"{os.path.splitext(file)[0]}_{user_id}{os.path.splitext(file)[1]}"
-                    new_path = os.path.join(STORAGE_PATH, new_filename)
-                    shutil.copy2(file_path, new_path)
-                    
-                    file_type = "step" if file.endswith('.step') else "obj"
-                    generated_files.append({
-                        "type": file_type,
-                        "path": new_path,
-                        "filename": new_filename
-                    })
-        
-        # If no files found in job directory, search in cad_outputs_generated
-        if not generated_files:
-            mqtt_manager.publish_progress(user_id, 60, "running", "Searching in cad_outputs_generated directory...")
-            cad_output_dir = "/app/cad_outputs_generated"
-            if os.path.exists(cad_output_dir):
-                for root, dirs, files in os.walk(cad_output_dir):
-                    for file in files:
-                        if file.endswith(('.step', '.obj')):
-                            file_path = os.path.join(root, file)
-                            # Copy file to main storage with filename containing user_id
-                            new_filename = f"{os.path.splitext(file)[0]}_{user_id}{os.path.splitext(file)[1]}"
-                            new_path = os.path.join(STORAGE_PATH, new_filename)
-                            shutil.copy2(file_path, new_path)
-                            
-                            file_type = "step" if file.endswith('.step') else "obj"
-                            generated_files.append({
-                                "type": file_type,
-                                "path": new_path,
-                                "filename": new_filename
-                            })
-                            
-                            # Cleanup original file
-                            try:
-                                os.remove(file_path)
-                            except:
-                                pass
+        mqtt_manager.publish_progress_throttled(user_id, 50, "running", "Searching for generated files...")
+        
+        # Find files in the user output directory, and in cad_outputs_generated only
+        # when the job directory has none. Files are moved (a rename within
+        # storage) not copied, since the sources are removed afterwards
+        moved = set()
+        for search_dir in (user_output_dir, "/app/cad_outputs_generated"):
+            if generated_files:
+                break
+            if search_dir != user_output_dir:
+                mqtt_manager.publish_progress_throttled(user_id, 60, "running", "Searching in cad_outputs_generated directory...")
+            if not os.path.isdir(search_dir):
+                continue
+            
+            for file_path in _scan_output_files(search_dir, ('.step', '.obj')):
+                stem, ext = os.path.splitext(os.path.basename(file_path))
+                # Same name in another subdirectory would overwrite it in storage
+                if (stem, ext) in moved:
+                    # The shared fallback directory must not keep it, or the
+                    # next job (possibly another user's) would collect it
+                    if search_dir != user_output_dir:
+                        try:
+                            os.remove(file_path)
+                        except OSError as e:
+                            print(f"Warning: Could not remove duplicate {file_path}: {e}")
+                    continue
+                # Move file to main storage with filename containing user_id
+                new_filename = f"{stem}_{user_id}{ext}"
+                new_path = os.path.join(STORAGE_PATH, new_filename)
+                try:
+                    shutil.move(file_path, new_path)
+                except OSError as e:
+                    print(f"Warning: Could not move {file_path}: {e}")
+                    continue
+                moved.add((stem, ext))
+                
+                file_type = "step" if ext == '.step' else "obj"
+                if file_type == "step":
+                    json_src = os.path.splitext(file_path)[0] + ".json"
+                    if os.path.exists(json_src):
+                        json_path = os.path.join(STORAGE_PATH, f"{stem}_{user_id}.json")
+                        shutil.move(json_src, json_path)
+                        converted_json[new_path] = json_path
+                generated_files.append({
+                    "type": file_type,
+                    "path": new_path,
+                    "filename": new_filename
+                })
         
         # Cleanup temp directory
         shutil.rmtree(user_output_dir, ignore_errors=True)
@@ -376,7 +497,7 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
                 "stderr_tail": stderr_tail,
             }
             mqtt_manager.publish_status(user_id, "failed", error_msg, str(details))
-            mqtt_manager.publish_progress(user_id, 0, "failed", error_msg, str(details))
+            mqtt_manager.publish_progress_throttled(user_id, 0, "failed", error_msg, str(details))
             return {
                 "status": "failed",
                 "error": error_msg,
@@ -384,73 +505,104 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
             }
         
         # Update progress
-        mqtt_manager.publish_progress(user_id, 70, "running", f"Found {len(generated_files)} files, generating PDF and JSON...")
+        mqtt_manager.publish_progress_throttled(user_id, 70, "running", f"Found {len(generated_files)} files, generating PDF and JSON...")
+        
+        # Generate PDF and JSON from STEP files (if any). The generators run
+        # separate freecadcmd processes, so they are started concurrently
+        step_files = [file_info for file_info in generated_files if file_info["type"] == "step"]
+        pdf_results = {}
+        json_results = {}
+        for file_info in step_files:
+            json_path = converted_json.get(file_info["path"])
+            if json_path:
+                print(f"Using JSON converted during the FreeCAD run: {json_path}")
+                json_results[file_info["path"]] = {
+                    "status": "success",
+                    "json_path": json_path,
+                    "filename": os.path.basename(json_path),
+                }
+        
+        tasks = [(pdf_results, generate_pdf_from_step, file_info) for file_info in step_files]
+        tasks += [
+            (json_results, generate_json_from_step, file_info)
+            for file_info in step_files
+            if file_info["path"] not in json_results
+        ]
+        if tasks:
+            with ThreadPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as executor:
+                futures = {}
+                for results, generate, file_info in tasks:
+                    print(f"Starting {generate.__name__} for STEP file: {file_info['path']}")
+                    futures[executor.submit(generate, file_info["path"], user_id)] = (results, file_info)
+                for done, future in enumerate(as_completed(futures), start=1):
+                    results, file_info = futures[future]
+                    results[file_info["path"]] = future.result()
+                    # Progress moves from 70% to 90% as conversions finish
+                    progress = 70 + int(done * 20 / len(futures))
+                    mqtt_manager.publish_progress_throttled(user_id, progress, "running", f"Processed {done}/{len(futures)} conversions: {file_info['filename']}")
         
-        # Generate PDF and JSON from STEP files (if any)
         pdf_files = []
         json_files = []
-        for i, file_info in enumerate(generated_files):
-            if file_info["type"] == "step":
-                # Update progress for each file
-                progress = 70 + int((i + 1) * 20 / len(generated_files))
-                mqtt_manager.publish_progress(user_id, progress, "running", f"Processing file {i+1}/{len(generated_files)}: {file_info['filename']}")
-                
-                print(f"Generating PDF from STEP file: {file_info['path']}")
-                pdf_result = generate_pdf_from_step(file_info["path"], user_id)
-                if pdf_result["status"] == "success":
-                    pdf_files.append({
-                        "type": "pdf",
-                        "path": pdf_result["pdf_path"],
-                        "filename": pdf_result["filename"]
-                    })
-                    print(f"PDF generated successfully: {pdf_result['filename']}")
-                else:
-                    print(f"PDF generation failed: {pdf_result['error']}")
-                
-                print(f"Generating JSON from STEP file: {file_info['path']}")
-                json_result = generate_json_from_step(file_info["path"], user_id)
-                if json_result["status"] == "success":
-                    json_files.append({
-                        "type": "json",
-                        "path": json_result["json_path"],
-                        "filename": json_result["filename"]
-                    })
-                    print(f"✅ JSON generated successfully: {json_result['filename']}")
-                else:
-                    error_msg = json_result.get("error", "Unknown error during JSON generation")
-                    details_payload = {
-                        "error": error_msg,
-                        "result": json_result,
-                        "step_file": file_info["path"],
-                    }
-                    print(f"⚠️ JSON generation failed for {file_info['filename']}: {error_msg}")
-                    mqtt_manager.publish_status(
-                        user_id,
-                        "failed",
-                        error_msg,
-                        json.dumps(details_payload),
-                    )
-                    mqtt_manager.publish_progress(
-                        user_id,
-                        0,
-                        "failed",
-                        error_msg,
-                        json.dumps(details_payload),
-                    )
-                    return {
-                        "status": "failed",
-                        "error": error_msg,
-                        "details": details_payload,
-                    }
+        for file_info in step_files:
+            pdf_result = pdf_results[file_info["path"]]
+            if pdf_result["status"] == "success":
+                pdf_files.append({
+                    "type": "pdf",
+                    "path": pdf_result["pdf_path"],
+                    "filename": pdf_result["filename"]
+                })
+                print(f"PDF generated successfully: {pdf_result['filename']}")
+            else:
+                print(f"PDF generation failed: {pdf_result['error']}")
+            
+            json_result = json_results[file_info["path"]]
+            if json_result["status"] == "success":
+                json_files.append({
+                    "type": "json",
+                    "path": json_result["json_path"],
+                    "filename": json_result["filename"]
+                })
+                print(f"✅ JSON generated successfully: {json_result['filename']}")
+            else:
+                error_msg = json_result.get("error", "Unknown error during JSON generation")
+                details_payload = {
+                    "error": error_msg,
+                    "result": json_result,
+                    "step_file": file_info["path"],
+                }
+                print(f"⚠️ JSON generation failed for {file_info['filename']}: {error_msg}")
+                mqtt_manager.publish_status(
+                    user_id,
+                    "failed",
+                    error_msg,
+                    json.dumps(details_payload),
+                )
+                mqtt_manager.publish_progress_throttled(
+                    user_id,
+                    0,
+                    "failed",
+                    error_msg,
+                    json.dumps(details_payload),
+                )
+                return {
+                    "status": "failed",
+                    "error": error_msg,
+                    "details": details_payload,
+                }
         
         # Combine all files (STEP, OBJ, PDF, JSON)
         all_files = generated_files + pdf_files + json_files
         print(f"✅ All generated files ({len(all_files)}): {[f['filename'] for f in all_files]}")
         
         # Final progress update
-        mqtt_manager.publish_progress(user_id, 100, "finished", f"Successfully generated {len(all_files)} files")
+        mqtt_manager.publish_progress_throttled(user_id, 100, "finished", f"Successfully generated {len(all_files)} files")
         mqtt_manager.publish_status(user_id, "finished", f"Job completed successfully with {len(all_files)} files")
         
+        # Push the result so the API can answer /result without polling RQ
+        current_job = get_current_job()
+        if current_job is not None:
+            mqtt_manager.publish_result(user_id, current_job.id, all_files)
+        
         return {
             "status": "success",
             "files": all_files
@@ -459,7 +611,7 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
     except subprocess.TimeoutExpired:
         error_msg = "FreeCAD command timed out after 5 minutes"
         mqtt_manager.publish_status(user_id, "failed", error_msg, None)
-        mqtt_manager.publish_progress(user_id, 0, "failed", error_msg, None)
+        mqtt_manager.publish_progress_throttled(user_id, 0, "failed", error_msg, None)
         return {
             "status": "failed",
             "error": error_msg
@@ -467,7 +619,7 @@ def execute_freecad_script(script_path: str, user_id: str = None) -> Dict[str, A
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
         mqtt_manager.publish_status(user_id, "failed", error_msg, None)
-        mqtt_manager.publish_progress(user_id, 0, "failed", error_msg, None)
+        mqtt_manager.publish_progress_throttled(user_id, 0, "failed", error_msg, None)
         return {
             "status": "failed",
             "error": error_msg
@@ -496,19 +648,29 @@ def generate_freecad_job(model_type: str, parameters: dict, job_id: str) -> Dict
     }
 
 
+# Rules of _extract_error_hint in priority order: (keywords that must all
+# appear in the output, hint)
+ERROR_HINT_RULES = (
+    (("modulenotfounderror",), "ImportError: missing module. Verify FreeCadUtil and workbench imports, or sys.path."),
+    (("no module named",), "ImportError: missing module. Verify FreeCadUtil and workbench imports, or sys.path."),
+    (("attributeerror", "maketub"), "AttributeError: Part.makeTub missing. Ensure FreeCadUtil monkey patch is loaded."),
+    (("permission denied",), "Permission issue writing outputs. Verify container paths and permissions."),
+    (("traceback", "export", ".step"), "STEP export failed. Ensure shapes are valid solids and export path exists."),
+    (("wkhtmltopdf", "not found"), "wkhtmltopdf missing. PDF generation may fail; check worker image deps."),
+    (("precision", "approximation"), "FreeCAD Precision API mismatch. Ensure FreeCAD 0.21+/1.0 compatibility fixes are applied."),
+)
+# Every keyword of the rules, found in one case-insensitive scan
+ERROR_HINT_KEYWORDS_RE = re.compile(
+    "|".join(re.escape(keyword) for keyword in dict.fromkeys(k for keys, _ in ERROR_HINT_RULES for k in keys)),
+    re.IGNORECASE,
+)
+
+
 def _extract_error_hint(stdout_text: str, stderr_text: str) -> str:
     """Try to infer a helpful error hint from FreeCAD outputs."""
-    text = f"{stdout_text}\n{stderr_text}".lower()
-    if "modulenotfounderror" in text or "no module named" in text:
-        return "ImportError: missing module. Verify FreeCadUtil and workbench imports, or sys.path."
-    if "attributeerror" in text and "maketub" in text:
-        return "AttributeError: Part.makeTub missing. Ensure FreeCadUtil monkey patch is loaded."
-    if "permission denied" in text:
-        return "Permission issue writing outputs. Verify container paths and permissions."
-    if "traceback" in text and "export" in text and ".step" in text:
-        return "STEP export failed. Ensure shapes are valid solids and export path exists."
-    if "wkhtmltopdf" in text and "not found" in text:
-        return "wkhtmltopdf missing. PDF generation may fail; check worker image deps."
-    if "precision" in text and "approximation" in text:
-        return "FreeCAD Precision API mismatch. Ensure FreeCAD 0.21+/1.0 compatibility fixes are applied."
+    found = {match.group(0).lower() for stream in (stdout_text, stderr_text)
+             for match in ERROR_HINT_KEYWORDS_RE.finditer(stream)}
+    for keywords, hint in ERROR_HINT_RULES:
+        if found.issuperset(keywords):
+            return hint
     return "See stdout_tail/stderr_tail for details."
\ No newline at end of file